@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+#  Compare the reflective and compiled SARIF model decoders
+#
+#  python3 -m benchmarks.decoders [-n 100] [sarif ...]
+import os
+import json
+import timeit
+import argparse
+
+from sariftoolkit.sarif.models import SarifModel
+from sariftoolkit.utils.dataclasses import _dataclass_from_dict, DataclassDecoder
+
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples", "sarifs")
+
+parser = argparse.ArgumentParser("benchmarks.decoders")
+parser.add_argument("-n", "--number", type=int, default=100)
+parser.add_argument("sarifs", nargs="*")
+
+
+def benchmark(path: str, number: int):
+    with open(path) as handle:
+        content = handle.read()
+    data = json.loads(content)
+
+    decoder = DataclassDecoder()
+    #  Compile outside of the timed loop, this only happens once per process
+    decoder.compile(SarifModel)
+
+    timings = {
+        "json.loads": lambda: json.loads(content),
+        "_dataclass_from_dict": lambda: _dataclass_from_dict(SarifModel, data),
+        "DataclassDecoder": lambda: decoder.decode(SarifModel, data),
+    }
+
+    print(f"{os.path.basename(path)} ({len(content)} bytes, {number} loops)")
+    for name, func in timings.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+        print(f" >> {name:<22} {seconds * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    arguments = parser.parse_args()
+
+    sarifs = arguments.sarifs or [
+        os.path.join(EXAMPLES, file) for file in sorted(os.listdir(EXAMPLES))
+    ]
+
+    for sarif in sarifs:
+        benchmark(sarif, arguments.number)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#  Time the load, transform and export stages on synthetic SARIF files
+#
+#  python3 -m benchmarks.stages [-n 3] [--results 10000] [--locations 1]
+#      [--flow-depth 0] [--rules 50] [--files 500] [--submodules 10] [--compact]
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks.synthetic import generateSarif, submodulePaths
+from sariftoolkit.sarif.sarif import loadSarif, exportSarif
+from sariftoolkit.sarif.index import buildIndex
+from sariftoolkit.plugins.relativepaths import RelativePaths
+from sariftoolkit.plugins.submodules import Submodules, SubmoduleModel
+
+
+parser = argparse.ArgumentParser("benchmarks.stages")
+parser.add_argument("-n", "--number", type=int, default=3, help="Repeats per stage")
+parser.add_argument("--results", type=int, default=10000)
+parser.add_argument("--locations", type=int, default=1)
+parser.add_argument("--flow-depth", type=int, default=0)
+parser.add_argument("--rules", type=int, default=50)
+parser.add_argument("--files", type=int, default=500)
+parser.add_argument("--submodules", type=int, default=10)
+parser.add_argument("--mode", default="sink", help="Submodules mode")
+parser.add_argument("--compact", action="store_true", help="Use compact models")
+
+
+def measure(setup, func, number: int):
+    #  Returns the fastest run and the peak memory allocated by `func`
+    seconds = None
+    for _ in range(number):
+        state = setup()
+        start = time.perf_counter()
+        func(state)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    state = setup()
+    tracemalloc.start()
+    func(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def benchmark(arguments):
+    workdir = tempfile.mkdtemp(prefix="sariftoolkit-benchmark-")
+    sarif_file = os.path.join(workdir, "synthetic.sarif")
+    output_file = os.path.join(workdir, "output.sarif")
+
+    with open(sarif_file, "w") as handle:
+        json.dump(
+            generateSarif(
+                results=arguments.results,
+                locations=arguments.locations,
+                flow_depth=arguments.flow_depth,
+                rules=arguments.rules,
+                files=arguments.files,
+                submodules=arguments.submodules,
+            ),
+            handle,
+        )
+    size = os.path.getsize(sarif_file)
+
+    relativepaths = RelativePaths()
+
+    submodules = Submodules()
+    submodules.mode = arguments.mode
+    submodules.compact = arguments.compact
+    submodules.cleanup = True
+    submodule_models = [
+        SubmoduleModel(name=os.path.basename(path), url=f"org/{index}", path=path)
+        for index, path in enumerate(submodulePaths(arguments.submodules))
+    ]
+
+    load = lambda: loadSarif(sarif_file, compact=arguments.compact)
+
+    stages = {
+        "loadSarif": (lambda: None, lambda _: load()),
+        "exportSarif": (load, lambda sarif: exportSarif(output_file, sarif)),
+        "buildIndex": (lambda: None, lambda _: buildIndex(sarif_file)),
+        "SarifIndex.query": (
+            lambda: buildIndex(sarif_file),
+            lambda index: list(index.query(rules=["py/synthetic-rule-0"])),
+        ),
+        "RelativePaths.processSarifFile": (
+            lambda: None,
+            lambda _: relativepaths.processSarifFile("root", sarif_file),
+        ),
+        "Submodules.processSarif": (
+            load,
+            lambda sarif: submodules.processSarif(submodule_models, sarif, sarif_file),
+        ),
+    }
+
+    print(
+        f"synthetic.sarif ({size / 1024 / 1024:.1f} MB, {arguments.results} results, "
+        f"{arguments.number} loops)"
+    )
+    for name, (setup, func) in stages.items():
+        seconds, peak = measure(setup, func, arguments.number)
+        print(
+            f" >> {name:<32} {seconds * 1000:9.1f} ms"
+            f" {arguments.results / seconds:11.0f} results/s"
+            f" {size / 1024 / 1024 / seconds:8.1f} MB/s"
+            f" {peak / 1024 / 1024:8.1f} MB peak"
+        )
+
+    for file in os.listdir(workdir):
+        os.remove(os.path.join(workdir, file))
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    #  Plugins log every result
+    logging.disable(logging.CRITICAL)
+
+    benchmark(parser.parse_args())
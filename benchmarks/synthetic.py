@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+#  Generate synthetic CodeQL shaped SARIF files
+#
+#  python3 -m benchmarks.synthetic -o large.sarif [--results 10000] [--locations 1]
+#      [--flow-depth 0] [--rules 50] [--files 500] [--submodules 0]
+import json
+import random
+import argparse
+
+
+parser = argparse.ArgumentParser("benchmarks.synthetic")
+parser.add_argument("-o", "--output", required=True, help="Output SARIF file")
+parser.add_argument("--results", type=int, default=10000)
+parser.add_argument("--locations", type=int, default=1, help="Locations per result")
+parser.add_argument("--flow-depth", type=int, default=0, help="Steps per code flow")
+parser.add_argument("--rules", type=int, default=50)
+parser.add_argument("--files", type=int, default=500)
+parser.add_argument(
+    "--submodules", type=int, default=0, help="Submodules files are spread over"
+)
+parser.add_argument("--seed", type=int, default=0)
+
+
+def submodulePaths(submodules: int):
+    return [f"vendor/submodule-{index}" for index in range(submodules)]
+
+
+def generateFiles(files: int, submodules: int = 0, seed: int = 0):
+    rand = random.Random(seed)
+    roots = ["src"] + submodulePaths(submodules)
+
+    return [
+        f"{rand.choice(roots)}/module-{index % 17}/file-{index}.py"
+        for index in range(files)
+    ]
+
+
+def generateLocation(uri: str, index: int, line: int):
+    return {
+        "physicalLocation": {
+            "artifactLocation": {"uri": uri, "uriBaseId": "%SRCROOT%", "index": index},
+            "region": {"startLine": line, "startColumn": 5, "endColumn": 42},
+        }
+    }
+
+
+def generateRule(index: int):
+    return {
+        "id": f"py/synthetic-rule-{index}",
+        "name": f"py/synthetic-rule-{index}",
+        "shortDescription": {"text": f"Synthetic rule {index}"},
+        "fullDescription": {"text": f"Synthetic rule {index} used for benchmarks"},
+        "defaultConfiguration": {"enabled": True, "level": "error"},
+        "properties": {
+            "tags": ["security", "external/cwe/cwe-079"],
+            "description": f"Synthetic rule {index} used for benchmarks",
+            "id": f"py/synthetic-rule-{index}",
+            "kind": "path-problem",
+            "name": f"Synthetic rule {index}",
+            "precision": "high",
+            "problem.severity": "error",
+            "security-severity": "6.1",
+        },
+    }
+
+
+def generateSarif(
+    results: int = 10000,
+    locations: int = 1,
+    flow_depth: int = 0,
+    rules: int = 50,
+    files: int = 500,
+    submodules: int = 0,
+    seed: int = 0,
+) -> dict:
+    rand = random.Random(seed)
+    file_paths = generateFiles(files, submodules, seed)
+
+    sarif_results = []
+    for index in range(results):
+        rule = index % rules
+
+        result = {
+            "ruleId": f"py/synthetic-rule-{rule}",
+            "ruleIndex": rule,
+            "rule": {"id": f"py/synthetic-rule-{rule}", "index": rule},
+            "message": {"text": f"Synthetic result {index}"},
+            "locations": [],
+            "partialFingerprints": {
+                "primaryLocationLineHash": f"{rand.getrandbits(64):016x}:1",
+                "primaryLocationStartColumnFingerprint": "4",
+            },
+        }
+
+        for _ in range(locations):
+            file_index = rand.randrange(files)
+            result["locations"].append(
+                generateLocation(
+                    file_paths[file_index], file_index, rand.randint(1, 2000)
+                )
+            )
+
+        if flow_depth:
+            steps = []
+            for _ in range(flow_depth):
+                file_index = rand.randrange(files)
+                location = generateLocation(
+                    file_paths[file_index], file_index, rand.randint(1, 2000)
+                )
+                location["message"] = {"text": "step"}
+                steps.append({"location": location})
+
+            result["codeFlows"] = [{"threadFlows": [{"locations": steps}]}]
+
+        sarif_results.append(result)
+
+    return {
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": [
+            {
+                "tool": {
+                    "driver": {
+                        "name": "CodeQL",
+                        "organization": "GitHub",
+                        "semanticVersion": "2.15.0",
+                        "rules": [generateRule(index) for index in range(rules)],
+                    }
+                },
+                "invocations": [
+                    {"toolExecutionNotifications": [], "executionSuccessful": True}
+                ],
+                "artifacts": [
+                    {"location": {"uri": uri, "uriBaseId": "%SRCROOT%", "index": i}}
+                    for i, uri in enumerate(file_paths)
+                ],
+                "results": sarif_results,
+                "columnKind": "utf16CodeUnits",
+                "properties": {"semmle.formatSpecifier": "sarifv2.1.0"},
+            }
+        ],
+    }
+
+
+if __name__ == "__main__":
+    arguments = parser.parse_args()
+
+    sarif = generateSarif(
+        results=arguments.results,
+        locations=arguments.locations,
+        flow_depth=arguments.flow_depth,
+        rules=arguments.rules,
+        files=arguments.files,
+        submodules=arguments.submodules,
+        seed=arguments.seed,
+    )
+
+    with open(arguments.output, "w") as handle:
+        json.dump(sarif, handle, indent=2)
@@ -1 +1,6 @@
-from sariftoolkit.plugins import *
+import importlib
+
+
+def __getattr__(name: str):
+    #  Plugins (e.g. `sariftoolkit.Submodules`) are imported on first use
+    return getattr(importlib.import_module("sariftoolkit.plugins"), name)
@@ -1,9 +1,15 @@
 import os
+import time
 import logging
 import argparse
 
-from sariftoolkit.plugin import loadPlugins
+_start = time.perf_counter()
+
+from sariftoolkit.plugin import loadPlugins, pluginConfigs
 from sariftoolkit.config import Config, load
+from sariftoolkit.metrics import metrics
+
+_imports = time.perf_counter() - _start
 
 
 parser = argparse.ArgumentParser(__name__)
@@ -11,10 +17,65 @@ parser.add_argument("--debug", action="store_true")
 parser.add_argument("-c", "--config", help="Configuration path")
 parser.add_argument("-l", "--list", action="store_true", help="List Plugins")
 parser.add_argument("-w", "--working", default=os.getcwd(), help="Working Directory")
+parser.add_argument(
+    "--profile", action="store_true", help="Report timing and memory per stage"
+)
+parser.add_argument("--metrics-json", help="Write per stage and per file metrics")
 
 parser_sarif = parser.add_argument_group("SARIF")
 parser_sarif.add_argument("-s", "--sarif", help="Sarif file or folder")
 parser_sarif.add_argument("-o", "--output", help="Output SARIF file or folder")
+parser_sarif.add_argument(
+    "--stream",
+    action="store_true",
+    help="Stream results through the plugins instead of loading the full SARIF",
+)
+parser_sarif.add_argument(
+    "--pipeline",
+    action="store_true",
+    help="Load each SARIF once and pass it through all the plugins in order",
+)
+parser_sarif.add_argument(
+    "--cache",
+    help="Cache directory used to skip SARIF files which were already processed",
+)
+parser_sarif.add_argument(
+    "--compact",
+    action="store_true",
+    help="Write SARIF output without indentation (uses orjson if installed)",
+)
+parser_sarif.add_argument(
+    "--shard-bytes",
+    type=int,
+    help="Split SARIF files larger than this (gzip compressed) into multiple files",
+)
+parser_sarif.add_argument(
+    "--shard-results",
+    type=int,
+    help="Split SARIF files with more results per run than this",
+)
+parser_sarif.add_argument(
+    "--artifact-table",
+    action="store_true",
+    help="Rewrite and classify 'run.artifacts' once and resolve locations by index",
+)
+parser_sarif.add_argument(
+    "--compact-models",
+    action="store_true",
+    help="Use slotted result models to reduce memory usage",
+)
+parser_sarif.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="Number of SARIF files to process in parallel (0 uses every core)",
+)
+parser_sarif.add_argument(
+    "--chunk-results",
+    type=int,
+    help="Split runs with more than N results into chunks processed by the jobs",
+)
 
 parser_github = parser.add_argument_group("GitHub")
 parser_github.add_argument(
@@ -27,16 +88,24 @@ parser_github.add_argument(
     default=os.environ.get("GITHUB_TOKEN"),
     help="GitHub PAT (default: $GITHUB_TOKEN)",
 )
+parser_github.add_argument(
+    "--github-instance",
+    default=os.environ.get("GITHUB_SERVER_URL", "https://github.com"),
+    help="GitHub instance URL (default: $GITHUB_SERVER_URL)",
+)
+parser_github.add_argument(
+    "--github-api-url",
+    default=os.environ.get("GITHUB_API_URL"),
+    help="GitHub API URL (default: $GITHUB_API_URL)",
+)
 
 
 if __name__ == "__main__":
-    plugins = loadPlugins()
-
-    for plugin in plugins:
-        parse_group = parser.add_argument_group(f"Plugin - {plugin.name}")
-        parse_group.add_argument(f"--enable-{plugin.name.lower()}", action="store_true")
+    configs = pluginConfigs()
 
-        plugin.arguments(parse_group)
+    for plugin_config in configs:
+        parse_group = parser.add_argument_group(f"Plugin - {plugin_config.name}")
+        plugin_config.addArguments(parse_group)
 
     arguments = parser.parse_args()
 
@@ -44,25 +113,58 @@ if __name__ == "__main__":
         level=logging.DEBUG if arguments.debug else logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
+    logging.debug(f"Startup :: core imports in {_imports * 1000:.1f}ms")
 
     if arguments.list:
         print(" ===== Plugins =====")
-        for plugin in plugins:
-            print(f" >> {plugin}")
+        for plugin_config in configs:
+            print(f" >> {plugin_config.name} - {plugin_config.description}")
         exit(0)
 
     config = load(arguments.config)
 
-    for plugin in plugins:
-        plugin.config.enabled = getattr(arguments, f"enable_{plugin.name.lower()}")
+    metrics.enabled = arguments.profile or bool(arguments.metrics_json)
+
+    for plugin_config in configs:
+        plugin_config.enabled = getattr(
+            arguments, f"enable_{plugin_config.name.lower()}"
+        )
+        logging.info(
+            f"Plugin :: {plugin_config.name} - "
+            + ("enabled" if plugin_config.enabled else "disabled")
+        )
+
+    #  Only the enabled plugins (and their dependencies) are imported
+    start = time.perf_counter()
+    plugins = loadPlugins([config for config in configs if config.enabled])
+    logging.debug(
+        f"Startup :: plugin imports in {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+    if arguments.stream:
+        from sariftoolkit.pipeline import runStreaming
+
+        with metrics.stage("run:stream"):
+            runStreaming(plugins, arguments)
 
-        logging.info(f"Plugin :: {plugin.name} - {plugin.config}")
+    elif arguments.pipeline:
+        from sariftoolkit.pipeline import runPipeline
 
-        if plugin.config.enabled:
+        with metrics.stage("run:pipeline"):
+            runPipeline(plugins, arguments)
+
+    else:
+        for plugin in plugins:
             plugin.logger.info(f"Plugin :: {plugin.name} starting...")
-            #  Run the plugin
-            plugin.run(
-                # Arguments
-                arguments=arguments,
-            )
+            #  Run the plugin
+            with metrics.stage(f"run:{plugin.name}"):
+                plugin.run(
+                    # Arguments
+                    arguments=arguments,
+                )
             plugin.logger.info(f"Plugin :: {plugin.name} finished.")
+
+    if arguments.profile:
+        metrics.report()
+    if arguments.metrics_json:
+        metrics.export(arguments.metrics_json)
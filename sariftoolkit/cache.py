@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sariftoolkit.sarif.shard import getShardPath
+
+
+logger = logging.getLogger("cache")
+
+#  Arguments which don't change the processed output
+IGNORED_ARGUMENTS = [
+    "cache",
+    "compact_models",
+    "config",
+    "chunk_results",
+    "debug",
+    "github_token",
+    "jobs",
+    "list",
+    "metrics_json",
+    "profile",
+]
+
+
+def hashFile(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashShards(output: str) -> dict:
+    #  Hash of every shard written after the first one (`results-2.sarif`, ...)
+    shards = {}
+    shard = 2
+    while os.path.exists(getShardPath(output, shard)):
+        path = getShardPath(output, shard)
+        shards[os.path.abspath(path)] = hashFile(path)
+        shard += 1
+    return shards
+
+
+@dataclass
+class ProcessingCache:
+    #  Content addressed records of processed SARIF files, keyed on the
+    #  settings (plugins and arguments) and the SARIF file hash
+    path: str
+    settings: str
+
+    def entryPath(self, sarif_hash: str) -> str:
+        return os.path.join(self.path, f"{self.settings}-{sarif_hash}.json")
+
+    def isProcessed(self, sarif_hash: str, output: str = None) -> bool:
+        entry_path = self.entryPath(sarif_hash)
+        if not os.path.exists(entry_path):
+            return False
+
+        with open(entry_path, "r") as handle:
+            entry = json.load(handle)
+
+        if entry.get("output") is None:
+            return output is None
+
+        #  The output (and each of its shards) still has to exist and be
+        #  unchanged
+        return (
+            output is not None
+            and os.path.abspath(output) == entry["output"]
+            and os.path.exists(output)
+            and hashFile(output) == entry.get("output_hash")
+            and hashShards(output) == entry.get("shards", {})
+        )
+
+    def record(self, sarif_file: str, sarif_hash: str, output: str = None):
+        entry = {"input": os.path.abspath(sarif_file), "input_hash": sarif_hash}
+        if output:
+            entry["output"] = os.path.abspath(output)
+            entry["output_hash"] = hashFile(output)
+            entry["shards"] = hashShards(output)
+
+        hashes = [sarif_hash]
+        #  Output written in place is recorded too, so it isn't processed again
+        if entry.get("output_hash") not in (None, sarif_hash):
+            hashes.append(entry["output_hash"])
+
+        for digest in hashes:
+            with open(self.entryPath(digest), "w") as handle:
+                json.dump(entry, handle)
+
+    def process(self, sarif_file: str, output: str, func: Callable):
+        #  Calls `func` unless the SARIF file was already processed, it isn't
+        #  recorded if `func` returns False (e.g. failed uploads)
+        sarif_hash = hashFile(sarif_file)
+
+        if self.isProcessed(sarif_hash, output):
+            logger.info(f"Skipping already processed SARIF file: {sarif_file}")
+            return None
+
+        retval = func()
+        if retval is False:
+            logger.info(f"Not recording incompletely processed file: {sarif_file}")
+            return retval
+
+        self.record(sarif_file, sarif_hash, output)
+        return retval
+
+
+def processCached(cache: ProcessingCache, sarif_file: str, output: str, func):
+    if not cache:
+        return func()
+    return cache.process(sarif_file, output, func)
+
+
+def loadCache(arguments, plugins: List) -> ProcessingCache:
+    if not arguments.cache:
+        return None
+
+    os.makedirs(arguments.cache, exist_ok=True)
+
+    settings = {
+        "plugins": [[plugin.name, plugin.version] for plugin in plugins],
+        "arguments": {
+            key: value
+            for key, value in vars(arguments).items()
+            if key not in IGNORED_ARGUMENTS
+        },
+    }
+    digest = hashlib.sha256(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    return ProcessingCache(os.path.abspath(arguments.cache), digest[:16])
@@ -1,4 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class PluginArgument:
+    #  Arguments for `ArgumentParser.add_argument`
+    flags: List[str]
+    options: dict = field(default_factory=dict)
 
 
 @dataclass
@@ -7,15 +15,154 @@ class PluginConfig:
     path: str = None
     enabled: bool = False
 
+    #  Metadata so the plugin is only imported when it's enabled
+    description: str = None
+    arguments: List[PluginArgument] = field(default_factory=list)
+
+    def addArguments(self, parser):
+        #  The only place the plugin's command line arguments are registered
+        parser.add_argument(f"--enable-{self.name.lower()}", action="store_true")
+
+        for argument in self.arguments:
+            parser.add_argument(*argument.flags, **argument.options)
+
 
 @dataclass
 class Plugins:
-    relativepaths: PluginConfig = PluginConfig(
-        "RelativePaths", "sariftoolkit.plugins.relativepaths"
+    relativepaths: PluginConfig = field(
+        default_factory=lambda: PluginConfig(
+            "RelativePaths",
+            "sariftoolkit.plugins.relativepaths",
+            description="Patching Relative SARIF paths",
+        )
+    )
+
+    fingerprints: PluginConfig = field(
+        default_factory=lambda: PluginConfig(
+            "Fingerprints",
+            "sariftoolkit.plugins.fingerprints",
+            description="Compute partialFingerprints for SARIF results",
+            arguments=[
+                PluginArgument(
+                    ["--fingerprints-overwrite"],
+                    {
+                        "action": "store_true",
+                        "help": "Recompute results which already have fingerprints",
+                    },
+                ),
+            ],
+        )
+    )
+
+    submodules: PluginConfig = field(
+        default_factory=lambda: PluginConfig(
+            "Submodules",
+            "sariftoolkit.plugins.submodules",
+            description="Git Submodules Splitter",
+            arguments=[
+                # PluginArgument(["--submodules-disable-autoremove"], ...),
+                PluginArgument(
+                    ["--submodules-disable-cleanup"],
+                    {
+                        "action": "store_false",
+                        "help": "Disable clean up newly created SARIF files",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-mode"],
+                    {
+                        "default": "sink",
+                        "help": "Submodule plugin mode ('sink' or 'path')",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-disable-cache"],
+                    {
+                        "action": "store_false",
+                        "help": "Disable caching discovered submodules for the current HEAD",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-uploads"],
+                    {
+                        "type": int,
+                        "default": 4,
+                        "help": "Number of SARIF files to upload concurrently",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-async"],
+                    {
+                        "action": "store_true",
+                        "help": "Discover, split and upload SARIF files concurrently",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-queue-size"],
+                    {
+                        "type": int,
+                        "default": 8,
+                        "help": "Submodule SARIF files waiting to be uploaded (async)",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-memory-budget", "--memory-budget"],
+                    {
+                        "type": int,
+                        "help": "Megabytes of submodule results kept in memory before spilling to disk",
+                    },
+                ),
+                PluginArgument(
+                    ["--submodules-compression-level"],
+                    {
+                        "type": int,
+                        "default": 6,
+                        "help": "Gzip compression level (1-9) used for uploading SARIF files",
+                    },
+                ),
+            ],
+        )
+    )
+
+    merge: PluginConfig = field(
+        default_factory=lambda: PluginConfig(
+            "Merge",
+            "sariftoolkit.plugins.merge",
+            description="Merge and deduplicate SARIF files",
+            arguments=[
+                PluginArgument(
+                    ["--merge-output"],
+                    {
+                        "help": "Merged SARIF file (default: --output or 'merged.sarif')",
+                    },
+                ),
+            ],
+        )
     )
 
-    submodules: PluginConfig = PluginConfig(
-        "Submodules", "sariftoolkit.plugins.submodules"
+    baseline: PluginConfig = field(
+        default_factory=lambda: PluginConfig(
+            "Baseline",
+            "sariftoolkit.plugins.baseline",
+            description="Only keep results which aren't in a baseline SARIF",
+            arguments=[
+                PluginArgument(
+                    ["--baseline-sarif"],
+                    {"help": "Baseline SARIF file (e.g. from the default branch)"},
+                ),
+                PluginArgument(
+                    ["--baseline-index"],
+                    {"help": "Baseline index (default: '<baseline-sarif>.bidx')"},
+                ),
+                PluginArgument(
+                    ["--baseline-fixed"],
+                    {
+                        "action": "store_true",
+                        "help": "Add baseline results which are fixed ('absent')",
+                    },
+                ),
+            ],
+        )
     )
 
 
@@ -24,7 +171,7 @@ class Config:
     name: str = "Default Configuration"
     version: str = "0.0.0"
 
-    plugins: Plugins = Plugins()
+    plugins: Plugins = field(default_factory=Plugins)
 
 
 def load(path: str) -> Config:
@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+logger = logging.getLogger("metrics")
+
+
+#  `ru_maxrss` is in bytes on macOS and in kilobytes on Linux / BSDs
+RSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+
+def peakRss() -> int:
+    #  Peak resident set size of the current process in bytes
+    if not resource:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_SCALE
+
+
+def cpuTime() -> float:
+    #  CPU time of every thread of the process and of its finished child
+    #  processes (`--jobs` workers, git)
+    cpu = time.process_time()
+    if resource:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+
+def countSarif(sarif):
+    #  Number of results and locations in a SARIF dict or model
+    results, locations = 0, 0
+
+    runs = sarif.get("runs", []) if isinstance(sarif, dict) else sarif.runs
+    for run in runs:
+        run_results = run.get("results", []) if isinstance(run, dict) else run.results
+        results += len(run_results)
+
+        for result in run_results:
+            if isinstance(result, dict):
+                locations += len(result.get("locations", []))
+            else:
+                locations += len(result.locations)
+
+    return results, locations
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+
+    @contextmanager
+    def stage(self, name: str, sarif_file: str = None):
+        #  Records the wall time, CPU time and peak RSS of a stage. The CPU time
+        #  is of the whole process (and its children), so it includes stages
+        #  running at the same time on other threads. Callers can add
+        #  `results` and `locations` to the record.
+        if not self.enabled:
+            yield {}
+            return
+
+        record = {"stage": name, "file": sarif_file, "pid": os.getpid()}
+        wall, cpu = time.perf_counter(), cpuTime()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = cpuTime() - cpu
+            record["peak_rss"] = peakRss()
+            self.records.append(record)
+
+    def summary(self) -> dict:
+        stages = {}
+        for record in self.records:
+            stage = stages.setdefault(
+                record["stage"],
+                {"count": 0, "wall": 0.0, "cpu": 0.0, "results": 0, "locations": 0},
+            )
+            stage["count"] += 1
+            stage["wall"] += record["wall"]
+            stage["cpu"] += record["cpu"]
+            stage["results"] += record.get("results", 0)
+            stage["locations"] += record.get("locations", 0)
+            stage["peak_rss"] = max(stage.get("peak_rss") or 0, record["peak_rss"] or 0)
+        return stages
+
+    def report(self):
+        logger.info(" ===== Metrics =====")
+        for name, stage in self.summary().items():
+            logger.info(
+                f" >> {name:<24} {stage['count']:>5}x "
+                f"wall {stage['wall']:8.3f}s cpu {stage['cpu']:8.3f}s "
+                f"results {stage['results']:>9} locations {stage['locations']:>9} "
+                f"peak {stage['peak_rss'] / 1024 / 1024:8.1f} MB"
+            )
+
+    def export(self, path: str):
+        logger.info(f"Writing metrics: {path}")
+        with open(path, "w") as handle:
+            json.dump(
+                {"stages": self.records, "summary": self.summary()}, handle, indent=2
+            )
+
+
+#  Process wide metrics, enabled by `--profile` / `--metrics-json`
+metrics = Metrics()
+
+
+def runWithMetrics(func, item):
+    #  Runs `func` in a worker process and returns the metrics it recorded
+    metrics.enabled = True
+    metrics.records = []
+
+    retval = func(item)
+    return retval, metrics.records
@@ -0,0 +1,256 @@
+import os
+import json
+import logging
+from functools import partial
+from typing import List
+
+from sariftoolkit.cache import ProcessingCache, loadCache, processCached
+from sariftoolkit.metrics import metrics, countSarif
+from sariftoolkit.plugin import Plugin, findSarifFiles, getJobs, mapSarifFiles
+from sariftoolkit.sarif.shard import writeSarifShards
+from sariftoolkit.sarif.stream import streamSarif
+
+
+logger = logging.getLogger("pipeline")
+
+#  Plugins and run metadata of the SARIF file being chunked (worker processes)
+_chunk_worker = {}
+
+
+def getOutputPath(arguments, sarif_file: str) -> str:
+    if arguments.output and arguments.output != "":
+        if os.path.isdir(arguments.sarif):
+            return os.path.join(arguments.output, os.path.basename(sarif_file))
+        return os.path.abspath(arguments.output)
+
+    logger.info("Replacing existing SARIF file")
+    return sarif_file
+
+
+def runBatchPlugins(plugins: List[Plugin], arguments):
+    #  Plugins which need every SARIF file at once (Merge) can't process one
+    #  file at a time, they are run on their own after the other plugins
+    for plugin in plugins:
+        plugin.logger.warning(
+            f"Plugin :: {plugin.name} needs every SARIF file, running it on its own"
+        )
+        with metrics.stage(f"run:{plugin.name}"):
+            plugin.run(arguments=arguments)
+
+
+def runStreaming(plugins: List[Plugin], arguments):
+    streamSarifFiles([plugin for plugin in plugins if not plugin.batch], arguments)
+    runBatchPlugins([plugin for plugin in plugins if plugin.batch], arguments)
+
+
+def streamSarifFiles(plugins: List[Plugin], arguments):
+    plugins = [plugin for plugin in plugins if plugin.setup(arguments)]
+    if not plugins:
+        return
+
+    rewrites = any(plugin.rewrites for plugin in plugins)
+    cache = loadCache(arguments, plugins)
+
+    if arguments.shard_bytes or arguments.shard_results:
+        logger.warning("Streamed SARIF files are written as is and not sharded")
+
+    mapSarifFiles(
+        partial(runSarifFile, streamSarifFile, plugins, arguments, rewrites, cache),
+        findSarifFiles(arguments.sarif),
+        jobs=arguments.jobs,
+    )
+
+
+def runSarifFile(
+    func,
+    plugins: List[Plugin],
+    arguments,
+    rewrites: bool,
+    cache: ProcessingCache,
+    sarif_file: str,
+):
+    output = None
+    if rewrites or arguments.output:
+        output = getOutputPath(arguments, sarif_file)
+
+    with metrics.stage("process", sarif_file):
+        return processCached(
+            cache,
+            sarif_file,
+            output,
+            lambda: func(plugins, arguments, sarif_file, output),
+        )
+
+
+def streamSarifFile(plugins: List[Plugin], arguments, sarif_file: str, output: str):
+    with metrics.stage("stream", sarif_file) as record:
+        record["results"], record["locations"] = 0, 0
+
+        def count(run: dict, result: dict) -> dict:
+            record["results"] += 1
+            record["locations"] += len(result.get("locations", []))
+            return result
+
+        sarif = streamSarif(
+            sarif_file,
+            output,
+            processors=([count] if metrics.enabled else [])
+            + [plugin.processResult for plugin in plugins],
+            finishers=[plugin.finishRun for plugin in plugins],
+            starters=[plugin.startRun for plugin in plugins],
+            lookahead=sorted(
+                set(key for plugin in plugins for key in plugin.lookahead)
+            ),
+        )
+
+    finished = [plugin.finishSarif(sarif, sarif_file) for plugin in plugins]
+    return False not in finished
+
+
+def runPipeline(plugins: List[Plugin], arguments):
+    processSarifFiles([plugin for plugin in plugins if not plugin.batch], arguments)
+    runBatchPlugins([plugin for plugin in plugins if plugin.batch], arguments)
+
+
+def processSarifFiles(plugins: List[Plugin], arguments):
+    plugins = [plugin for plugin in plugins if plugin.setup(arguments)]
+    if not plugins:
+        return
+
+    rewrites = any(plugin.rewrites for plugin in plugins)
+    cache = loadCache(arguments, plugins)
+
+    #  Chunked SARIF files use the jobs for their results, one file at a time
+    mapSarifFiles(
+        partial(runSarifFile, processSarifFile, plugins, arguments, rewrites, cache),
+        findSarifFiles(arguments.sarif),
+        jobs=1 if arguments.chunk_results else arguments.jobs,
+    )
+
+
+def initChunkWorker(plugins: List[Plugin], runs: List[dict]):
+    #  The plugins and runs (tool, artifacts, ...) are only sent once to each
+    #  worker, chunks only have the results
+    _chunk_worker["plugins"] = plugins
+    _chunk_worker["runs"] = runs
+
+
+def processChunk(task: tuple) -> tuple:
+    run_index, results = task
+    run = _chunk_worker["runs"][run_index]
+
+    states = []
+    for plugin in _chunk_worker["plugins"]:
+        results, state = plugin.processChunk(run, run_index, results)
+        states.append(state)
+    return results, states
+
+
+def createChunkExecutor(plugins: List[Plugin], arguments, sarif: dict):
+    #  Process pool for the runs with more than `--chunk-results` results
+    chunk_size = arguments.chunk_results
+    jobs = getJobs(arguments.jobs)
+    if not chunk_size or jobs <= 1:
+        return None
+
+    runs = sarif.get("runs", [])
+    if not any(len(run.get("results") or []) > chunk_size for run in runs):
+        return None
+
+    unsupported = [plugin.name for plugin in plugins if not plugin.chunks]
+    if unsupported:
+        logger.warning(f"Plugins can't process results in chunks: {unsupported}")
+        return None
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    metadata = [
+        {key: value for key, value in run.items() if key != "results"} for run in runs
+    ]
+    return ProcessPoolExecutor(
+        max_workers=jobs, initializer=initChunkWorker, initargs=(plugins, metadata)
+    )
+
+
+def processRunChunks(
+    executor, plugins: List[Plugin], run: dict, run_index: int, chunk_size: int
+) -> list:
+    #  Results are processed in chunks on the workers and merged back in order
+    tasks = (
+        (run_index, run["results"][start : start + chunk_size])
+        for start in range(0, len(run["results"]), chunk_size)
+    )
+
+    results = []
+    for chunk, states in executor.map(processChunk, tasks):
+        for plugin, state in zip(plugins, states):
+            plugin.mergeChunk(run, run_index, chunk, state)
+        results.extend(chunk)
+    return results
+
+
+def processSarifFile(plugins: List[Plugin], arguments, sarif_file: str, output: str):
+    #  Parses the SARIF file once, passes every result through all the plugins
+    #  in order and only writes the SARIF file once at the end
+    logger.info(f"Processing SARIF File: {sarif_file}")
+
+    with metrics.stage("load", sarif_file) as record:
+        with open(sarif_file, "r") as handle:
+            sarif = json.load(handle)
+
+        if metrics.enabled:
+            record["results"], record["locations"] = countSarif(sarif)
+
+    executor = createChunkExecutor(plugins, arguments, sarif)
+    try:
+        for run_index, run in enumerate(sarif.get("runs", [])):
+            if "results" not in run:
+                continue
+
+            for plugin in plugins:
+                plugin.startRun(run, run_index)
+
+            if executor and len(run["results"]) > arguments.chunk_results:
+                with metrics.stage("chunks", sarif_file):
+                    results = processRunChunks(
+                        executor, plugins, run, run_index, arguments.chunk_results
+                    )
+            else:
+                results = []
+                for result in run["results"]:
+                    for plugin in plugins:
+                        result = plugin.processResult(run, result)
+                        if result is None:
+                            break
+
+                    if result is not None:
+                        results.append(result)
+
+            for plugin in plugins:
+                results.extend(plugin.finishRun(run))
+
+            run["results"] = results
+    finally:
+        if executor:
+            executor.shutdown()
+
+    #  Same as streaming, plugins are finished with the SARIF without results
+    document = dict(sarif)
+    document["runs"] = [
+        {key: value for key, value in run.items() if key != "results"}
+        for run in sarif.get("runs", [])
+    ]
+    finished = [plugin.finishSarif(document, sarif_file) for plugin in plugins]
+
+    if output:
+        logger.info(f"Writing SARIF File: {output}")
+        writeSarifShards(
+            output,
+            sarif,
+            indent=2,
+            compact=arguments.compact,
+            max_bytes=arguments.shard_bytes,
+            max_results=arguments.shard_results,
+        )
+
+    return False not in finished
@@ -1,36 +1,103 @@
 import os
 import json
+import time
 import logging
+import importlib
 from argparse import ArgumentParser
 from dataclasses import dataclass
-from typing import Tuple
+from functools import partial
+from typing import Any, List, Tuple
 
-from sariftoolkit.config import Plugins
-from sariftoolkit.sarif.sarif import loadSarif
+from sariftoolkit.config import Plugins, PluginConfig
+from sariftoolkit.metrics import metrics, runWithMetrics
 
 
 def _dynamic_import(path: str, class_name: str):
-    paths = path.split(".")
     try:
-        module = __import__(paths[0])
-        for p in paths[1:]:
-            module = getattr(module, p)
+        start = time.perf_counter()
+        module = importlib.import_module(path)
+
+        logging.debug(
+            f"Plugin :: imported {path} in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
         return getattr(module, class_name)
 
     except Exception as err:
         logging.error(f"Failed to import {path}")
 
 
-def loadPlugins():
+def findSarifFiles(path: str):
+    if not os.path.exists(path):
+        raise Exception(f"{path} doesn't exist")
+
+    sarif_files = []
+
+    if os.path.isdir(path):
+        for file in sorted(os.listdir(path)):
+            file_path = os.path.abspath(os.path.join(path, file))
+            _, extention = os.path.splitext(file)
+
+            if extention in [".json", ".sarif"]:
+                sarif_files.append(file_path)
+    else:
+        _, extention = os.path.splitext(path)
+        if extention in [".json", ".sarif"]:
+            sarif_files.append(path)
+
+    return sarif_files
+
+
+def getJobs(jobs: int) -> int:
+    #  Number of worker processes (0 uses every core)
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def mapSarifFiles(func, sarif_files: list, jobs: int = 1) -> list:
+    #  Calls `func` for every SARIF file, using a process pool when `jobs` is
+    #  more than 1 (0 uses every core). Return values are in the same order as
+    #  `sarif_files` so output is the same regardless of the number of jobs.
+    jobs = getJobs(jobs)
+
+    if jobs <= 1 or len(sarif_files) <= 1:
+        return [func(sarif_file) for sarif_file in sarif_files]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    if metrics.enabled:
+        #  Metrics recorded in the workers are sent back with the results
+        func = partial(runWithMetrics, func)
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(sarif_files))) as executor:
+        results = list(executor.map(func, sarif_files))
+
+    if metrics.enabled:
+        for _, records in results:
+            metrics.records.extend(records)
+        results = [retval for retval, _ in results]
+
+    return results
+
+
+def pluginConfigs() -> List[PluginConfig]:
+    #  Plugin metadata, available without importing any of the plugins
     plugins = Plugins()
 
-    retval = []
-    for key, _ in plugins.__annotations__.items():
-        value = plugins.__getattribute__(key)
+    return [getattr(plugins, key) for key in plugins.__annotations__.keys()]
+
+
+def loadPlugins(configs: List[PluginConfig] = None):
+    #  Only imports the plugins for the configs provided (default: all)
+    if configs is None:
+        configs = pluginConfigs()
 
-        clss = _dynamic_import(value.path, value.name)()
+    retval = []
+    for config in configs:
+        clss = _dynamic_import(config.path, config.name)()
 
-        clss.config = getattr(plugins, key)
+        clss.config = config
+        clss.description = config.description
         # print(f" >> {key} - {clss}")
 
         retval.append(clss)
@@ -47,38 +114,78 @@ class Plugin:
 
     logging = None
 
+    #  Plugin modifies the results in the SARIF file itself
+    rewrites = False
+
+    #  Results can be processed in chunks on worker processes (`--chunk-results`)
+    chunks = False
+
+    #  Plugin needs every SARIF file at once (Merge), it isn't streamed or run
+    #  in the pipeline but on its own after the other plugins
+    batch = False
+
+    #  Run members needed by `startRun` when streaming, even if they come
+    #  after the results in the SARIF file (see `streamSarif`)
+    lookahead = []
+
+    #  Cache of already processed SARIF files (`--cache`)
+    file_cache = None
+
     def __post_init__(self):
         self.logger = logging.getLogger(f"Plugin-{self.name}")
 
     def arguments(self, parser: ArgumentParser):
-        pass
+        #  Arguments are declared in the plugin's config (`sariftoolkit.config`)
+        self.config.addArguments(parser)
 
     def run(self, **kargvs):
         raise Exception("Plugin Sub Class doesn't support a run function...")
 
-    def loadSarif(self, path: str):
-        if not os.path.exists(path):
-            raise Exception(f"{path} doesn't exist")
+    def setup(self, arguments) -> bool:
+        #  Returns if the plugin should process SARIF files
+        return True
 
-        sarif_files = []
+    def startRun(self, run: dict, run_index: int):
+        #  Called before the results of every run with its index in the SARIF
+        #  file, runs without results are skipped
+        pass
 
-        if os.path.isdir(path):
-            for file in os.listdir(path):
-                file_path = os.path.abspath(os.path.join(path, file))
-                _, extention = os.path.splitext(file)
+    def processResult(self, run: dict, result: dict) -> dict:
+        return result
+
+    def processChunk(
+        self, run: dict, run_index: int, results: list
+    ) -> Tuple[list, Any]:
+        #  Runs on a worker process with a copy of the plugin and of the run
+        #  (without results), returns the results and state for `mergeChunk`
+        retval = []
+        for result in results:
+            result = self.processResult(run, result)
+            if result is not None:
+                retval.append(result)
+        return retval, None
+
+    def mergeChunk(self, run: dict, run_index: int, results: list, state: Any):
+        #  Called in the main process for every chunk, in order
+        pass
 
-                if extention in [".json", ".sarif"]:
+    def finishRun(self, run: dict) -> list:
+        #  Results added to the end of the run (not passed to other plugins)
+        return []
 
-                    sarif_model = loadSarif(file_path)
+    def finishSarif(self, sarif: dict, sarif_file: str) -> bool:
+        #  Returns False if the SARIF file wasn't completely processed (for
+        #  example failed uploads), so it isn't recorded in the cache
+        return True
 
-                    sarif_files.append((sarif_model, file_path))
-        else:
+    def loadSarif(self, path: str, compact: bool = False):
+        from sariftoolkit.sarif.sarif import loadSarif
 
-            _, extention = os.path.splitext(path)
-            if extention in [".json", ".sarif"]:
+        sarif_files = []
 
-                sarif_model = loadSarif(path)
+        for file_path in findSarifFiles(path):
+            sarif_model = loadSarif(file_path, compact=compact)
 
-                sarif_files.append((sarif_model, path))
+            sarif_files.append((sarif_model, file_path))
 
         return sarif_files
@@ -1,2 +1,18 @@
-from sariftoolkit.plugins.relativepaths import RelativePaths
-from sariftoolkit.plugins.submodules import Submodules
+import importlib
+
+
+#  Plugins are imported on first use so their dependencies are only loaded
+#  when the plugin is used
+_PLUGINS = {
+    "RelativePaths": "sariftoolkit.plugins.relativepaths",
+    "Fingerprints": "sariftoolkit.plugins.fingerprints",
+    "Submodules": "sariftoolkit.plugins.submodules",
+    "Merge": "sariftoolkit.plugins.merge",
+    "Baseline": "sariftoolkit.plugins.baseline",
+}
+
+
+def __getattr__(name: str):
+    if name in _PLUGINS:
+        return getattr(importlib.import_module(_PLUGINS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
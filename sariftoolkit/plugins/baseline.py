@@ -0,0 +1,288 @@
+import os
+import json
+from dataclasses import dataclass, field
+
+from sariftoolkit.metrics import metrics
+from sariftoolkit.plugin import Plugin
+from sariftoolkit.sarif.index import SarifIndex, loadIndex
+from sariftoolkit.sarif.stream import streamSarif
+
+
+INDEX_VERSION = 2
+
+
+@dataclass
+class BaselineIndex:
+    #  Results of the baseline SARIF file keyed by run (`getRunKey`) and by
+    #  the rule, uri and line hash of the result, with their position in the
+    #  file
+    sarif: str = None
+    size: int = 0
+    mtime: int = 0
+
+    runs: dict = field(default_factory=dict)
+
+    def isValid(self, sarif: str = None) -> bool:
+        #  Without the baseline SARIF file the index is used as is
+        if not sarif or not os.path.exists(sarif):
+            return True
+        stat = os.stat(sarif)
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+    def save(self, path: str):
+        with open(path, "w") as handle:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "sarif": self.sarif,
+                    "size": self.size,
+                    "mtime": self.mtime,
+                    "runs": self.runs,
+                },
+                handle,
+                separators=(",", ":"),
+            )
+
+    @staticmethod
+    def load(path: str):
+        with open(path, "r") as handle:
+            data = json.load(handle)
+
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return BaselineIndex(
+            sarif=data["sarif"],
+            size=data["size"],
+            mtime=data["mtime"],
+            runs=data["runs"],
+        )
+
+
+def getToolName(run: dict) -> str:
+    return run.get("tool", {}).get("driver", {}).get("name")
+
+
+def getRunKey(run: dict, run_index: int) -> str:
+    #  Runs of the same tool (CodeQL uploads one run per language) are told
+    #  apart by their category, or else by their position in the SARIF file
+    category = (run.get("automationDetails") or {}).get("id")
+    if category is None:
+        category = f"#{run_index}"
+    return f"{getToolName(run)}\0{category}"
+
+
+def getResultKey(result: dict) -> str:
+    #  Results are the same if the rule, the primary location uri and its line
+    #  hash match. The start line is used when there are no fingerprints.
+    rule = result.get("ruleId") or (result.get("rule") or {}).get("id")
+
+    artifact, region = {}, {}
+    for location in result.get("locations", [])[:1]:
+        physical = location.get("physicalLocation") or {}
+        artifact = physical.get("artifactLocation") or {}
+        region = physical.get("region") or {}
+
+    fingerprint = (result.get("partialFingerprints") or {}).get(
+        "primaryLocationLineHash"
+    )
+    if not fingerprint:
+        fingerprint = f"line:{region.get('startLine')}"
+
+    return f"{rule}\0{artifact.get('uri')}\0{fingerprint}"
+
+
+def detachResult(result: dict) -> dict:
+    #  Rule and artifact indexes of baseline results point into the baseline
+    #  SARIF file, they're removed from results added to another SARIF file
+    result.pop("ruleIndex", None)
+    if isinstance(result.get("rule"), dict):
+        result["rule"].pop("index", None)
+
+    def detach(value):
+        if isinstance(value, dict):
+            artifact = value.get("artifactLocation")
+            if isinstance(artifact, dict) and artifact.get("uri"):
+                artifact.pop("index", None)
+            for item in value.values():
+                detach(item)
+        elif isinstance(value, list):
+            for item in value:
+                detach(item)
+
+    detach(result.get("locations"))
+    detach(result.get("relatedLocations"))
+    detach(result.get("codeFlows"))
+    return result
+
+
+@dataclass
+class Baseline(Plugin):
+    name: str = "Baseline"
+    version: str = "1.0.0"
+
+    sarif: str = None
+    index_path: str = None
+    fixed: bool = False
+
+    index: BaselineIndex = None
+    sarif_index: SarifIndex = None
+
+    #  Baseline results (run key -> key -> positions) not yet seen in the
+    #  SARIF file being processed
+    remaining: dict = None
+    stream_key: str = None
+    new: int = 0
+    unchanged: int = 0
+
+    rewrites = True
+    #  The run category can come after the results
+    lookahead = ["automationDetails"]
+
+    def setup(self, arguments) -> bool:
+        self.sarif = arguments.baseline_sarif
+        self.index_path = arguments.baseline_index
+        self.fixed = arguments.baseline_fixed
+
+        if not self.sarif and not self.index_path:
+            self.logger.warning("No baseline SARIF file or index provided")
+            return False
+
+        if self.sarif:
+            self.sarif = os.path.abspath(self.sarif)
+        if not self.index_path:
+            self.index_path = self.sarif + ".bidx"
+
+        self.index = self.loadIndex()
+        if self.index is None:
+            return False
+
+        results = sum(
+            len(positions)
+            for keys in self.index.runs.values()
+            for positions in keys.values()
+        )
+        self.logger.info(f"Baseline :: {results} results ({self.index_path})")
+
+        if self.fixed and not self.index.sarif:
+            self.logger.warning("Fixed results need the baseline SARIF file")
+            self.fixed = False
+        return True
+
+    def loadIndex(self) -> BaselineIndex:
+        #  The index is only rebuilt when the baseline SARIF file has changed
+        if os.path.exists(self.index_path):
+            index = BaselineIndex.load(self.index_path)
+            if index and index.isValid(self.sarif):
+                self.logger.debug(f"Loaded baseline index :: {self.index_path}")
+                if self.sarif:
+                    index.sarif = self.sarif
+                elif index.sarif and not os.path.exists(index.sarif):
+                    index.sarif = None
+                elif index.sarif and not index.isValid(index.sarif):
+                    #  Fixed results can't be read from a different SARIF file
+                    index.sarif = None
+                return index
+
+        if not self.sarif or not os.path.exists(self.sarif):
+            self.logger.error(f"Baseline SARIF file does not exist: {self.sarif}")
+            return None
+
+        with metrics.stage("baseline", self.sarif):
+            index = self.buildIndex(self.sarif)
+
+        self.logger.info(f"Saving baseline index :: {self.index_path}")
+        index.save(self.index_path)
+        return index
+
+    def buildIndex(self, sarif_file: str) -> BaselineIndex:
+        #  The baseline is streamed, only one result is decoded at a time
+        self.logger.info(f"Indexing baseline SARIF File: {sarif_file}")
+
+        stat = os.stat(sarif_file)
+        index = BaselineIndex(sarif_file, stat.st_size, stat.st_mtime_ns)
+
+        position, keys = 0, None
+
+        def start(run: dict, run_index: int):
+            nonlocal keys
+            keys = index.runs.setdefault(getRunKey(run, run_index), {})
+
+        def collect(run: dict, result: dict):
+            nonlocal position
+
+            keys.setdefault(getResultKey(result), []).append(position)
+            position += 1
+
+        streamSarif(
+            sarif_file, processors=[collect], starters=[start], lookahead=self.lookahead
+        )
+        return index
+
+    def run(self, arguments, **kargvs):
+        from sariftoolkit.pipeline import runStreaming
+
+        #  SARIF files are streamed against the baseline index
+        runStreaming([self], arguments)
+
+    def getRemaining(self, run_key: str) -> dict:
+        if self.remaining is None:
+            self.remaining = {}
+
+        remaining = self.remaining.get(run_key)
+        if remaining is None:
+            keys = self.index.runs.get(run_key, {})
+            remaining = self.remaining[run_key] = {
+                key: list(positions) for key, positions in keys.items()
+            }
+        return remaining
+
+    def startRun(self, run: dict, run_index: int):
+        #  Results are only compared with the matching run of the baseline
+        self.stream_key = getRunKey(run, run_index)
+
+    def processResult(self, run: dict, result: dict) -> dict:
+        #  Each baseline result only matches a single result
+        positions = self.getRemaining(self.stream_key).get(getResultKey(result))
+        if positions:
+            positions.pop()
+            self.unchanged += 1
+            return None
+
+        result["baselineState"] = "new"
+        self.new += 1
+        return result
+
+    def finishRun(self, run: dict) -> list:
+        if not self.fixed:
+            return []
+
+        #  Baseline results of the matching run which weren't found are fixed,
+        #  they are only added once
+        remaining = self.getRemaining(self.stream_key)
+        self.remaining[self.stream_key] = {}
+
+        positions = sorted(
+            position for positions in remaining.values() for position in positions
+        )
+        if not positions:
+            return []
+
+        if not self.sarif_index:
+            self.sarif_index = loadIndex(self.index.sarif)
+
+        fixed = []
+        for result in self.sarif_index.readResults(positions):
+            result = detachResult(result)
+            result["baselineState"] = "absent"
+            fixed.append(result)
+
+        self.logger.info(f"Baseline :: {len(fixed)} fixed results ({getToolName(run)})")
+        return fixed
+
+    def finishSarif(self, sarif: dict, sarif_file: str):
+        self.logger.info(
+            f"Baseline :: {self.new} new and {self.unchanged} unchanged results "
+            f"({sarif_file})"
+        )
+        self.remaining, self.stream_key = None, None
+        self.new, self.unchanged = 0, 0
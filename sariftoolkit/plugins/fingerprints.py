@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import mmap
+import codecs
+import itertools
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sariftoolkit.cache import loadCache, processCached
+from sariftoolkit.metrics import metrics, countSarif
+from sariftoolkit.plugin import Plugin, findSarifFiles, mapSarifFiles
+from sariftoolkit.sarif.shard import writeSarifShards
+
+
+#  Same rolling hash as the CodeQL Action (`fingerprints.ts`), a hash of the
+#  100 characters (ignoring spaces and tabs) from the start of each line
+BLOCK_SIZE = 100
+MOD = 37
+MASK = (1 << 64) - 1
+FIRST_MOD = pow(MOD, BLOCK_SIZE, 1 << 64)
+
+TAB, SPACE, LF, CR, EOF = 9, 32, 10, 13, 65535
+
+#  UTF-16 in the byte order of `memoryview.cast`
+UTF16 = "utf-16-le" if sys.byteorder == "little" else "utf-16-be"
+#  Bytes of the source file decoded at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+def computeLineHashes(chunks: Iterable[str], lines: set = None) -> Dict[int, str]:
+    #  Returns the hash of each line (or only of `lines`, stopping as soon as
+    #  they are all hashed) of the text read in chunks
+    window = [0] * BLOCK_SIZE
+    line_numbers = [-1] * BLOCK_SIZE
+    hash_counts = {}
+    hashes = {}
+    wanted = len(lines) if lines is not None else -1
+
+    value, index, line, line_start, prev_cr = 0, 0, 0, True, False
+
+    #  Hashed as UTF-16 code units (surrogate pairs), like JavaScript strings
+    codes = (
+        memoryview(chunk.encode(UTF16, "surrogatepass")).cast("H") for chunk in chunks
+    )
+    for units in itertools.chain(codes, [(EOF,)]):
+        for current in units:
+            #  Skip tabs, spaces and line feeds directly after a carriage return
+            if current == SPACE or current == TAB or (prev_cr and current == LF):
+                prev_cr = False
+                continue
+
+            if current == CR:
+                current = LF
+                prev_cr = True
+            else:
+                prev_cr = False
+
+            number = line_numbers[index]
+            if number != -1:
+                key = format(value, "x")
+                count = hash_counts[key] = hash_counts.get(key, 0) + 1
+                line_numbers[index] = -1
+
+                if lines is None or number in lines:
+                    hashes[number] = f"{key}:{count}"
+                    #  Hashes only depend on the lines before them
+                    if len(hashes) == wanted:
+                        return hashes
+
+            if line_start:
+                line_start = False
+                line += 1
+                line_numbers[index] = line
+            if current == LF:
+                line_start = True
+
+            begin = window[index]
+            window[index] = current
+            value = (MOD * value + current - FIRST_MOD * begin) & MASK
+            index = index + 1 if index + 1 < BLOCK_SIZE else 0
+
+    #  Flush the remaining lines
+    for _ in range(BLOCK_SIZE):
+        number = line_numbers[index]
+        if number != -1:
+            key = format(value, "x")
+            count = hash_counts[key] = hash_counts.get(key, 0) + 1
+            line_numbers[index] = -1
+            if lines is None or number in lines:
+                hashes[number] = f"{key}:{count}"
+
+        begin = window[index]
+        window[index] = 0
+        value = (MOD * value - FIRST_MOD * begin) & MASK
+        index = index + 1 if index + 1 < BLOCK_SIZE else 0
+
+    return hashes
+
+
+def readSourceFile(buffer) -> Iterator[str]:
+    #  Decodes the memory mapped file a chunk at a time
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    for start in range(0, len(buffer), CHUNK_SIZE):
+        yield decoder.decode(buffer[start : start + CHUNK_SIZE])
+    yield decoder.decode(b"", final=True)
+
+
+def hashSourceFile(item: Tuple[str, List[int]]) -> Dict[int, str]:
+    #  Memory maps the source file and hashes the lines, runs in a worker
+    path, lines = item
+    lines = set(lines) if lines is not None else None
+
+    #  Empty files can't be memory mapped
+    if not os.path.getsize(path):
+        return computeLineHashes([], lines)
+
+    with open(path, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return computeLineHashes(readSourceFile(buffer), lines)
+
+
+@dataclass
+class Fingerprints(Plugin):
+    name: str = "Fingerprints"
+    version: str = "1.0.0"
+
+    overwrite: bool = False
+    compact_json: bool = False
+    shard_bytes: int = None
+    shard_results: int = None
+    jobs: int = 1
+
+    #  Folders uris are resolved from (workspace and working directory)
+    roots: List[str] = field(default_factory=list)
+
+    #  uri -> source file path (or None)
+    source_paths: dict = field(default_factory=dict)
+    #  Source file path -> line -> hash, every file is only hashed once
+    line_hashes: dict = field(default_factory=dict)
+
+    rewrites = True
+    chunks = True
+
+    def setup(self, arguments) -> bool:
+        self.overwrite = arguments.fingerprints_overwrite
+        self.compact_json = arguments.compact
+        self.shard_bytes = arguments.shard_bytes
+        self.shard_results = arguments.shard_results
+        self.jobs = arguments.jobs
+
+        self.roots = []
+        for root in (arguments.github_workspace, arguments.working):
+            root = os.path.abspath(root)
+            if root not in self.roots:
+                self.roots.append(root)
+        return True
+
+    def run(self, arguments, **kargvs):
+        from sariftoolkit.pipeline import getOutputPath
+
+        if not self.setup(arguments):
+            return
+
+        self.file_cache = loadCache(arguments, [self])
+
+        for sarif_file in findSarifFiles(arguments.sarif):
+            output = getOutputPath(arguments, sarif_file)
+
+            processCached(
+                self.file_cache,
+                sarif_file,
+                output,
+                lambda: self.processSarifFile(sarif_file, output),
+            )
+
+    def processSarifFile(self, sarif_file: str, output: str):
+        self.logger.info(f"Processing SARIF File: {sarif_file}")
+
+        with metrics.stage("load", sarif_file) as record:
+            with open(sarif_file, "r") as handle:
+                sarif = json.load(handle)
+
+            if metrics.enabled:
+                record["results"], record["locations"] = countSarif(sarif)
+
+        #  Results are grouped by source file so each file is hashed once
+        sources = {}
+        for run in sarif.get("runs", []):
+            for result in run.get("results", []):
+                location = self.getPrimaryLocation(result)
+                if location:
+                    sources.setdefault(location[0], []).append((result, location[1]))
+
+        with metrics.stage("fingerprints", sarif_file) as record:
+            self.hashSourceFiles(
+                {
+                    path: [line for _, line in results]
+                    for path, results in sources.items()
+                }
+            )
+
+            count = 0
+            for path, results in sources.items():
+                hashes = self.line_hashes.get(path, {})
+                for result, line in results:
+                    if line in hashes:
+                        self.setFingerprint(result, hashes[line])
+                        count += 1
+
+            record["results"] = count
+
+        self.logger.info(f"Computed {count} fingerprints ({len(sources)} files)")
+        self.logger.info(f"Writing SARIF File: {output}")
+        writeSarifShards(
+            output,
+            sarif,
+            indent=2,
+            compact=self.compact_json,
+            max_bytes=self.shard_bytes,
+            max_results=self.shard_results,
+        )
+
+    def hashSourceFiles(self, sources: Dict[str, List[int]]):
+        #  Hashes the lines which haven't been hashed yet, across processes
+        items = []
+        for path, lines in sources.items():
+            hashes = self.line_hashes.get(path, {})
+            missing = sorted(set(line for line in lines if line not in hashes))
+            if missing:
+                items.append((path, missing))
+
+        for (path, _), hashes in zip(
+            items, mapSarifFiles(hashSourceFile, items, jobs=self.jobs)
+        ):
+            self.line_hashes.setdefault(path, {}).update(hashes)
+
+    def getSourcePath(self, uri: str) -> str:
+        if uri in self.source_paths:
+            return self.source_paths[uri]
+
+        path = urllib.parse.unquote(uri)
+        if path.startswith("file://"):
+            path = urllib.parse.urlparse(path).path
+
+        source = None
+        if os.path.isabs(path):
+            source = path if os.path.isfile(path) else None
+        else:
+            for root in self.roots:
+                if os.path.isfile(os.path.join(root, path)):
+                    source = os.path.join(root, path)
+                    break
+
+        self.source_paths[uri] = source
+        return source
+
+    def getPrimaryLocation(self, result: dict):
+        #  Source file and line of the result, if it needs a fingerprint
+        fingerprints = result.get("partialFingerprints") or {}
+        if fingerprints.get("primaryLocationLineHash") and not self.overwrite:
+            return None
+
+        for location in result.get("locations", [])[:1]:
+            physical = location.get("physicalLocation") or {}
+            uri = (physical.get("artifactLocation") or {}).get("uri")
+            line = (physical.get("region") or {}).get("startLine")
+
+            #  Locations without a line are unlikely to be source files
+            if not uri or line is None:
+                return None
+
+            path = self.getSourcePath(uri)
+            if path:
+                return (path, line)
+        return None
+
+    def setFingerprint(self, result: dict, line_hash: str):
+        fingerprints = result.setdefault("partialFingerprints", {})
+        fingerprints["primaryLocationLineHash"] = line_hash
+
+    def processResult(self, run: dict, result: dict) -> dict:
+        #  Streamed results are hashed one at a time, the source file is hashed
+        #  completely the first time it's used
+        location = self.getPrimaryLocation(result)
+        if not location:
+            return result
+
+        path, line = location
+        if path not in self.line_hashes:
+            self.line_hashes[path] = hashSourceFile((path, None))
+
+        line_hash = self.line_hashes[path].get(line)
+        if line_hash:
+            self.setFingerprint(result, line_hash)
+        return result
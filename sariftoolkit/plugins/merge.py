@@ -0,0 +1,260 @@
+import os
+import json
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from sariftoolkit.metrics import metrics, countSarif
+from sariftoolkit.plugin import Plugin, findSarifFiles
+from sariftoolkit.sarif.shard import writeSarifShards
+
+
+@dataclass
+class MergedRun:
+    #  Run the results of every SARIF file with the same tool are merged into
+    run: dict
+    results: list = field(default_factory=list)
+
+    #  Hash index of the results already in the run
+    result_keys: set = field(default_factory=set)
+    #  Rule ID -> index in `tool.driver.rules`
+    rule_indexes: dict = field(default_factory=dict)
+    #  (uri, uriBaseId) -> index in `run.artifacts`
+    artifact_indexes: dict = field(default_factory=dict)
+
+
+@dataclass
+class Merge(Plugin):
+    name: str = "Merge"
+    version: str = "1.0.0"
+
+    output: str = None
+    compact_json: bool = False
+    shard_bytes: int = None
+    shard_results: int = None
+
+    #  Tool -> merged run, in the order the tools are first seen
+    merged_runs: dict = field(default_factory=dict)
+
+    rewrites = True
+    batch = True
+
+    def setup(self, arguments) -> bool:
+        self.compact_json = arguments.compact
+        self.shard_bytes = arguments.shard_bytes
+        self.shard_results = arguments.shard_results
+        self.output = self.getOutputPath(arguments)
+        return True
+
+    def getOutputPath(self, arguments) -> str:
+        output = arguments.merge_output or arguments.output
+        if not output:
+            folder = arguments.sarif
+            if not os.path.isdir(folder):
+                folder = os.path.dirname(os.path.abspath(folder))
+            output = os.path.join(folder, "merged.sarif")
+        elif os.path.isdir(output):
+            output = os.path.join(output, "merged.sarif")
+        return os.path.abspath(output)
+
+    def run(self, arguments, **kargvs):
+        if not self.setup(arguments):
+            return
+
+        #  Previously merged output isn't merged into itself
+        sarif_files = [
+            sarif_file
+            for sarif_file in findSarifFiles(arguments.sarif)
+            if os.path.abspath(sarif_file) != self.output
+        ]
+        if not sarif_files:
+            self.logger.warning("No SARIF files found to merge")
+            return
+
+        sarif, duplicates = self.mergeSarifFiles(sarif_files)
+
+        results, _ = countSarif(sarif)
+        self.logger.info(
+            f"Merged {len(sarif_files)} SARIF files into {len(sarif['runs'])} runs "
+            f"({results} results, {duplicates} duplicates removed)"
+        )
+        self.logger.info(f"Writing SARIF File: {self.output}")
+        writeSarifShards(
+            self.output,
+            sarif,
+            indent=2,
+            compact=self.compact_json,
+            max_bytes=self.shard_bytes,
+            max_results=self.shard_results,
+        )
+
+    def mergeSarifFiles(self, sarif_files: List[str]) -> Tuple[dict, int]:
+        #  SARIF files are loaded one at a time and merged into the runs
+        document, duplicates = None, 0
+        self.merged_runs = {}
+
+        for sarif_file in sarif_files:
+            self.logger.info(f"Merging SARIF File: {sarif_file}")
+
+            with metrics.stage("load", sarif_file) as record:
+                with open(sarif_file, "r") as handle:
+                    sarif = json.load(handle)
+
+                if metrics.enabled:
+                    record["results"], record["locations"] = countSarif(sarif)
+
+            with metrics.stage("merge", sarif_file):
+                for run in sarif.get("runs", []):
+                    duplicates += self.mergeRun(run)
+
+            if document is None:
+                document = {key: value for key, value in sarif.items() if key != "runs"}
+
+        document["runs"] = []
+        for merged in self.merged_runs.values():
+            merged.run["results"] = merged.results
+            document["runs"].append(merged.run)
+
+        return document, duplicates
+
+    def getRunKey(self, run: dict) -> tuple:
+        #  Runs are merged by tool, different analysis categories are kept apart
+        driver = run.get("tool", {}).get("driver", {})
+        category = run.get("automationDetails", {}).get("id")
+        return (driver.get("name"), category)
+
+    def getResultKey(self, result: dict) -> tuple:
+        #  Results are the same finding if the rule, fingerprints and primary
+        #  location match
+        rule = result.get("ruleId") or (result.get("rule") or {}).get("id")
+        fingerprints = result.get("partialFingerprints") or {}
+
+        artifact, region = {}, {}
+        for location in result.get("locations", [])[:1]:
+            physical = location.get("physicalLocation") or {}
+            artifact = physical.get("artifactLocation") or {}
+            region = physical.get("region") or {}
+
+        return (
+            rule,
+            tuple(sorted(fingerprints.items())),
+            artifact.get("uri"),
+            artifact.get("uriBaseId"),
+            artifact.get("index"),
+            region.get("startLine"),
+            region.get("startColumn"),
+            region.get("endLine"),
+            region.get("endColumn"),
+        )
+
+    def mergeRun(self, run: dict) -> int:
+        #  Merges the run into the run for the same tool, returns the number of
+        #  duplicate results removed
+        results = run.get("results", [])
+        key = self.getRunKey(run)
+
+        merged = self.merged_runs.get(key)
+        if merged is None:
+            merged = MergedRun({k: v for k, v in run.items() if k != "results"})
+            self.merged_runs[key] = merged
+            rule_map, artifact_map = {}, {}
+        else:
+            driver = run.get("tool", {}).get("driver", {})
+            rule_map = self.mergeRules(merged, driver.get("rules", []))
+            artifact_map = self.mergeArtifacts(merged, run.get("artifacts", []))
+
+            if run.get("invocations"):
+                merged.run.setdefault("invocations", []).extend(run["invocations"])
+
+        duplicates = 0
+        for result in results:
+            if rule_map:
+                self.remapRuleIndexes(result, rule_map)
+            if artifact_map:
+                self.remapArtifactIndexes(result, artifact_map)
+
+            result_key = self.getResultKey(result)
+            if result_key in merged.result_keys:
+                duplicates += 1
+                continue
+
+            merged.result_keys.add(result_key)
+            merged.results.append(result)
+
+        return duplicates
+
+    def mergeRules(self, merged: MergedRun, rules: list) -> dict:
+        #  Adds the rules missing from the merged run and returns a mapping of
+        #  the old rule indexes which changed
+        if not rules:
+            return {}
+
+        merged_rules = (
+            merged.run.setdefault("tool", {})
+            .setdefault("driver", {})
+            .setdefault("rules", [])
+        )
+        if not merged.rule_indexes:
+            for index, rule in enumerate(merged_rules):
+                merged.rule_indexes.setdefault(rule.get("id"), index)
+
+        mapping = {}
+        for index, rule in enumerate(rules):
+            new_index = merged.rule_indexes.get(rule.get("id"))
+            if new_index is None or rule.get("id") is None:
+                new_index = len(merged_rules)
+                merged_rules.append(rule)
+                merged.rule_indexes.setdefault(rule.get("id"), new_index)
+
+            if new_index != index:
+                mapping[index] = new_index
+        return mapping
+
+    def mergeArtifacts(self, merged: MergedRun, artifacts: list) -> dict:
+        #  Same as rules, artifacts are keyed on their location
+        if not artifacts:
+            return {}
+
+        merged_artifacts = merged.run.setdefault("artifacts", [])
+
+        if not merged.artifact_indexes:
+            for index, artifact in enumerate(merged_artifacts):
+                merged.artifact_indexes.setdefault(self.getArtifactKey(artifact), index)
+
+        mapping = {}
+        for index, artifact in enumerate(artifacts):
+            artifact_key = self.getArtifactKey(artifact)
+            new_index = merged.artifact_indexes.get(artifact_key)
+            if new_index is None or artifact_key is None:
+                new_index = len(merged_artifacts)
+                merged_artifacts.append(artifact)
+                merged.artifact_indexes.setdefault(artifact_key, new_index)
+
+            if new_index != index:
+                mapping[index] = new_index
+        return mapping
+
+    def getArtifactKey(self, artifact: dict) -> tuple:
+        location = artifact.get("location") or {}
+        if not location.get("uri"):
+            return None
+        return (location.get("uri"), location.get("uriBaseId"))
+
+    def remapRuleIndexes(self, result: dict, mapping: dict):
+        if result.get("ruleIndex") in mapping:
+            result["ruleIndex"] = mapping[result["ruleIndex"]]
+        rule = result.get("rule")
+        if rule and rule.get("index") in mapping and not rule.get("toolComponent"):
+            rule["index"] = mapping[rule["index"]]
+
+    def remapArtifactIndexes(self, value, mapping: dict):
+        #  Every artifactLocation in the result (locations, related locations,
+        #  code flows, fixes, ...) references `run.artifacts`
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == "artifactLocation" and isinstance(item, dict):
+                    if item.get("index") in mapping:
+                        item["index"] = mapping[item["index"]]
+                self.remapArtifactIndexes(item, mapping)
+        elif isinstance(value, list):
+            for item in value:
+                self.remapArtifactIndexes(item, mapping)
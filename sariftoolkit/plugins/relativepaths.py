@@ -1,19 +1,45 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 import json
-from sariftoolkit.plugin import Plugin
+import logging
+from typing import Tuple
+from sariftoolkit.cache import loadCache, processCached
+from sariftoolkit.metrics import metrics, countSarif
+from sariftoolkit.plugin import Plugin, mapSarifFiles
+from sariftoolkit.sarif.shard import writeSarifShards
 
 
 @dataclass
 class RelativePaths(Plugin):
     name: str = "RelativePaths"
     version: str = "1.0.0"
-    description: str = "Patching Relative SARIF paths"
 
-    def run(self, arguments, **kargvs):
+    root: str = None
+    compact_json: bool = False
+    artifact_table: bool = False
+    shard_bytes: int = None
+    shard_results: int = None
+
+    #  Root -> original uri -> rewritten uri
+    rewritten_uris: dict = field(default_factory=dict)
+
+    #  Rewritten `run.artifacts` uris of the run being processed
+    stream_run: dict = None
+    artifact_uris: list = None
+
+    rewrites = True
+    chunks = True
+
+    def setup(self, arguments) -> bool:
         workspace = os.path.abspath(arguments.github_workspace)
         working = os.path.abspath(arguments.working)
 
+        self.compact_json = arguments.compact
+        self.artifact_table = arguments.artifact_table
+        self.lookahead = ["artifacts"] if self.artifact_table else []
+        self.shard_bytes = arguments.shard_bytes
+        self.shard_results = arguments.shard_results
+
         if workspace and not os.path.exists(workspace):
             raise Exception(f"Root path provided does not exist: {workspace}")
 
@@ -25,29 +51,34 @@ class RelativePaths(Plugin):
             self.logger.warning(
                 f"Working path is the same as root path. This is not recommended."
             )
+            return False
+
+        self.root = os.path.relpath(working, workspace)
+        self.logger.info(f"Difference in paths :: {self.root}")
+
+        return True
+
+    def run(self, arguments, **kargvs):
+        if not self.setup(arguments):
             return
 
-        difference = os.path.relpath(working, workspace)
-        self.logger.info(f"Difference in paths :: {difference}")
+        self.file_cache = loadCache(arguments, [self])
+
+        sarif_files = []
 
         if os.path.isdir(arguments.sarif):
-            for file in os.listdir(arguments.sarif):
+            for file in sorted(os.listdir(arguments.sarif)):
                 file_path = os.path.abspath(os.path.join(arguments.sarif, file))
                 _, extention = os.path.splitext(file)
 
                 if extention in [".json", ".sarif"]:
-
-                    sarif = self.processSarifFile(
-                        difference, os.path.join(arguments.sarif, file)
-                    )
-
                     if arguments.output and arguments.output != "":
                         output = os.path.join(arguments.output, file)
                     else:
                         self.logger.info("Replacing existing SARIF file")
                         output = file_path
 
-                    self.writeSarif(output, sarif)
+                    sarif_files.append((os.path.join(arguments.sarif, file), output))
         else:
             if arguments.output and arguments.output != "":
                 output = os.path.abspath(arguments.output)
@@ -55,37 +86,147 @@ class RelativePaths(Plugin):
                 self.logger.info("Replacing existing SARIF file")
                 output = arguments.sarif
 
-            sarif = self.processSarifFile(difference, arguments.sarif)
+            sarif_files.append((arguments.sarif, output))
+
+        mapSarifFiles(self.rewriteSarifFile, sarif_files, jobs=arguments.jobs)
+
+    def rewriteSarifFile(self, paths: Tuple[str, str]):
+        path, output = paths
+
+        def rewrite():
+            sarif = self.processSarifFile(self.root, path)
 
             self.writeSarif(output, sarif)
 
+        processCached(self.file_cache, path, output, rewrite)
+
     def writeSarif(self, path: str, data: dict):
         self.logger.info(f"Writing SARIF File: {path}")
-        with open(path, "w") as handle:
-            json.dump(data, handle, indent=2)
-
-    def updateLocation(self, location, root) -> dict:
-        uri = (
-            location.get("physicalLocation", {}).get("artifactLocation", {}).get("uri")
+        writeSarifShards(
+            path,
+            data,
+            indent=2,
+            compact=self.compact_json,
+            max_bytes=self.shard_bytes,
+            max_results=self.shard_results,
         )
 
-        new_location = location.copy()
+    def getArtifactLocation(self, location: dict) -> dict:
+        if not location:
+            return None
+        artifact = location.get("physicalLocation", {}).get("artifactLocation")
+        if artifact and artifact.get("uri"):
+            return artifact
+        return None
+
+    def collectArtifactLocations(self, result: dict, table: list) -> list:
+        #  Flattens every artifactLocation with a uri in the result into `table`
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Rule({result.get('ruleId')})")
+
+        #  https://github.com/microsoft/sarif-tutorials/blob/main/docs/2-Basics.md#-linking-results-to-artifacts
+        for location in result.get("locations", []):
+            artifact = self.getArtifactLocation(location)
+            if artifact:
+                table.append(artifact)
+
+        # Code Flows
+        for flow in result.get("codeFlows", []):
+            for thread_flow in flow.get("threadFlows", []):
+                for flow_step in thread_flow.get("locations", []):
+                    artifact = self.getArtifactLocation(flow_step.get("location"))
+                    if artifact:
+                        table.append(artifact)
+
+        return table
+
+    def rewriteArtifactLocations(self, table: list, root: str):
+        #  Rewrites every uri in the table, each distinct uri is only built once
+        uris = self.rewritten_uris.setdefault(root, {})
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
+        for artifact in table:
+            uri = artifact["uri"]
+            new_uri = uris.get(uri)
+            if new_uri is None:
+                new_uri = uris[uri] = f"{root}/{uri}"
+                if debug:
+                    self.logger.debug(f"Update: {uri} => {new_uri}")
+
+            artifact["uri"] = new_uri
+
+    def rewriteRunArtifacts(self, run: dict, root: str) -> list:
+        #  Rewrites each artifact in `run.artifacts` once, returning the new
+        #  uri for every artifact index
+        locations = [
+            artifact.get("location") or {} for artifact in run.get("artifacts", [])
+        ]
+        self.rewriteArtifactLocations(
+            [location for location in locations if location.get("uri")], root
+        )
+        return [location.get("uri") for location in locations]
+
+    def resolveArtifactLocations(self, table: list, artifact_uris: list, root: str):
+        #  Locations referencing an artifact use its rewritten uri, the rest
+        #  are rewritten as normal
+        unresolved = []
+        for artifact in table:
+            index = artifact.get("index")
+            if index is not None and 0 <= index < len(artifact_uris):
+                if artifact_uris[index]:
+                    artifact["uri"] = artifact_uris[index]
+                    continue
+            unresolved.append(artifact)
+
+        self.rewriteArtifactLocations(unresolved, root)
 
-        if uri:
-            new_uri = f"{root}/{uri}"
+    def updateLocation(self, location, root) -> dict:
+        artifact = self.getArtifactLocation(location)
+        if artifact:
+            self.rewriteArtifactLocations([artifact], root)
+        return location
+
+    def updateResult(self, result: dict, root: str) -> dict:
+        self.rewriteArtifactLocations(self.collectArtifactLocations(result, []), root)
+        return result
+
+    def startRun(self, run: dict, run_index: int):
+        #  Artifacts are rewritten before the plugins after this one see them
+        if self.artifact_table:
+            self.stream_run = run
+            self.artifact_uris = self.rewriteRunArtifacts(run, self.root)
+
+    def processResult(self, run: dict, result: dict) -> dict:
+        if not self.artifact_table:
+            return self.updateResult(result, self.root)
+
+        if run is not self.stream_run:
+            self.startRun(run, -1)
+
+        self.resolveArtifactLocations(
+            self.collectArtifactLocations(result, []), self.artifact_uris, self.root
+        )
+        return result
 
-            self.logger.debug(f"Update: {uri} => {new_uri}")
+    def mergeChunk(self, run: dict, run_index: int, results: list, state):
+        #  Workers only rewrite their copy of `run.artifacts`
+        if run is not self.stream_run:
+            self.startRun(run, run_index)
 
-            new_location["physicalLocation"]["artifactLocation"]["uri"] = new_uri
-        return new_location
+    def finishSarif(self, sarif: dict, sarif_file: str):
+        self.stream_run, self.artifact_uris = None, None
 
     def processSarifFile(self, root: str, path: str):
         self.logger.info(f"Processing SARIF File: {path}")
         if not os.path.exists(path):
             raise Exception("Sarif file does not exist")
 
-        with open(path) as handle:
-            sarif = json.load(handle)
+        with metrics.stage("load", path) as record:
+            with open(path) as handle:
+                sarif = json.load(handle)
+
+            if metrics.enabled:
+                record["results"], record["locations"] = countSarif(sarif)
 
         for run in sarif.get("runs", []):
             tool = run.get("tool", {}).get("driver", {})
@@ -95,37 +236,15 @@ class RelativePaths(Plugin):
                 )
             )
 
-            new_results = []
-
+            #  Results without locations are kept, the same as when streaming
+            table = []
             for result in run.get("results", []):
-                self.logger.debug(f"Rule({result.get('ruleId')})")
-
-                # Locations
-                new_locations = []
-                for location in result.get("locations", []):
-                    #  https://github.com/microsoft/sarif-tutorials/blob/main/docs/2-Basics.md#-linking-results-to-artifacts
-                    new_location = self.updateLocation(location, root)
-                    new_locations.append(new_location)
-
-                if new_locations:
-                    result["locations"] = new_locations
-                    new_results.append(result)
-
-                # Code Flows
-                for flow in result.get("codeFlows", []):
-                    for flow_step in flow.get("threadFlows", []):
-                        new_locations = []
-                        for location in flow_step.get("locations", []):
-                            new_location = self.updateLocation(
-                                location.get("location"), root
-                            )
-
-                            new_locations.append({"location": new_location})
-
-                        if new_locations:
-                            flow_step["locations"] = new_locations
-
-            if new_results:
-                run["results"] = new_results
+                self.collectArtifactLocations(result, table)
+
+            if self.artifact_table:
+                artifact_uris = self.rewriteRunArtifacts(run, root)
+                self.resolveArtifactLocations(table, artifact_uris, root)
+            else:
+                self.rewriteArtifactLocations(table, root)
 
         return sarif
@@ -1,18 +1,51 @@
+import io
 import os
-import copy
+import json
 import gzip
+import hashlib
+import asyncio
+import time
 import base64
+import tempfile
+import threading
 import subprocess
 import urllib.parse
-from typing import List
-from dataclasses import dataclass
-from argparse import ArgumentParser
+from array import array
+from typing import Any, Iterator, List
+from dataclasses import dataclass, field, asdict, replace
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
-from sariftoolkit.plugin import Plugin
-from sariftoolkit.sarif.sarif import exportSarif
-from sariftoolkit.sarif.models import SarifModel
+from sariftoolkit.cache import hashFile, loadCache, processCached
+from sariftoolkit.metrics import metrics
+from sariftoolkit.plugin import Plugin, findSarifFiles, mapSarifFiles
+from sariftoolkit.sarif.sarif import (
+    loadSarif,
+    exportSarif,
+    decodeSarif,
+    dumpSarif,
+    encodeSarif,
+    sarifAsDict,
+)
+from sariftoolkit.sarif.models import SarifModel, ResultsModel
+from sariftoolkit.utils.dataclasses import dataclassAsDict
+from sariftoolkit.sarif.shard import (
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_RESULTS,
+    UPLOAD_MAX_RUNS,
+    shardSarif,
+)
+from sariftoolkit.sarif.stream import JsonStreamWriter
+
+
+#  Upload responses which are retried with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+#  Longest time to wait between upload retries (seconds)
+MAX_RETRY_WAIT = 15 * 60
+
+#  Guards creating the upload session shared by the upload threads
+_session_lock = threading.Lock()
 
 
 @dataclass
@@ -24,53 +57,300 @@ class SubmoduleModel:
     commit: str = None
 
 
+class SubmoduleIndex:
+    #  Trie of submodule path components, lookups are O(path depth) and
+    #  nested submodules resolve to the deepest matching submodule
+    def __init__(self, submodules: List[SubmoduleModel]):
+        self.submodules = submodules
+        self.root = {}
+
+        for submodule in submodules:
+            node = self.root
+            for part in submodule.path.strip("/").split("/"):
+                node = node.setdefault(part, {})
+            #  `None` never collides with a path component
+            node[None] = submodule
+
+    def lookup(self, file: str):
+        parts = file.split("/")
+
+        submodule, depth = None, 0
+        node = self.root
+        #  The submodule root itself isn't a file in the submodule
+        for index, part in enumerate(parts[:-1]):
+            node = node.get(part)
+            if node is None:
+                break
+            if None in node:
+                submodule, depth = node[None], index + 1
+
+        if submodule:
+            return (submodule, "/".join(parts[depth:]))
+        return (None, None)
+
+
+@dataclass
+class ResultSpill:
+    #  Encoded results of a submodule by run and rule ID. They are kept in
+    #  memory until the memory budget is used, then written to a temporary
+    #  file (one result per line) and only their offsets are kept.
+    results: dict = field(default_factory=dict)
+    handle: Any = None
+    offset: int = 0
+    #  Encoded bytes held in memory
+    size: int = 0
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def append(self, run_index: int, rule_id: str, data: bytes) -> int:
+        #  Returns the number of bytes added to memory
+        rules = self.results.setdefault(run_index, {})
+        if self.handle:
+            rules.setdefault(rule_id, array("Q")).append(self.write(data))
+            return 0
+
+        rules.setdefault(rule_id, []).append(data)
+        self.size += len(data)
+        return len(data)
+
+    def write(self, data: bytes) -> int:
+        offset = self.offset
+        self.handle.write(data + b"\n")
+        self.offset += len(data) + 1
+        return offset
+
+    def spill(self) -> int:
+        #  Moves the results to disk, returns the number of bytes freed
+        if self.handle:
+            return 0
+        self.handle = tempfile.TemporaryFile(prefix="sarif-spill-")
+
+        for rules in self.results.values():
+            for rule_id, results in rules.items():
+                rules[rule_id] = array("Q", (self.write(data) for data in results))
+
+        size, self.size = self.size, 0
+        return size
+
+    def count(self, run_index: int) -> int:
+        return sum(len(results) for results in self.results.get(run_index, {}).values())
+
+    def read(self, run_index: int) -> Iterator[bytes]:
+        #  Results of the run in the same order as in memory (grouped by rule)
+        for results in self.results.get(run_index, {}).values():
+            for item in results:
+                if not self.handle:
+                    yield item
+                    continue
+                self.handle.seek(item)
+                yield self.handle.readline()[:-1]
+
+    def close(self):
+        if self.handle:
+            self.handle.close()
+            self.handle = None
+
+
 @dataclass
 class Submodules(Plugin):
     name: str = "Submodules"
     version: str = "1.0.0"
-    description: str = "Git Submodules Splitter"
 
     token: str = None
     cleanup: bool = False
+    compression: int = 6
 
     mode: str = "sink"
+    compact: bool = False
+    compact_json: bool = False
+    cache: bool = True
+    artifact_table: bool = False
+
+    instance: str = "https://github.com"
+    api_url: str = None
+    uploads: int = 4
+    queue_size: int = 8
+    upload_bytes: int = UPLOAD_MAX_BYTES
+    upload_results: int = UPLOAD_MAX_RESULTS
+    #  Bytes of encoded submodule results kept in memory (`--memory-budget`)
+    memory_budget: int = None
+    retries: int = 5
+    backoff: float = 1.0
+
+    submodules: List[SubmoduleModel] = field(default_factory=list)
+    submodule_sarifs: dict = field(default_factory=dict)
+    submodule_index: SubmoduleIndex = None
+
+    stream_run: dict = None
+    stream_run_index: int = -1
+
+    #  Run index -> (submodule, new uri) for each artifact in `run.artifacts`
+    artifact_tables: dict = field(default_factory=dict)
+
+    session: requests.Session = None
+    uploader: ThreadPoolExecutor = None
+    pending_uploads: list = field(default_factory=list)
+
+    #  SARIF file -> [uploads remaining, SARIF file hash, uploaded] in async mode
+    pending_files: dict = field(default_factory=dict)
+
+    #  Bytes of results buffered in memory for the SARIF file being split
+    buffered: int = 0
+    #  Submodule SARIF file written from spills -> (results per run, temporary)
+    assembled: dict = field(default_factory=dict)
+
+    chunks = True
+
+    def __getstate__(self):
+        #  Uploads stay in the process that queued them (chunk workers)
+        state = dict(self.__dict__)
+        state.update(session=None, uploader=None, pending_uploads=[])
+        return state
+
+    def setup(self, arguments) -> bool:
+        self.configure(arguments)
+
+        with metrics.stage("discovery"):
+            self.submodules = self.getSubmodules(
+                os.path.abspath(arguments.github_workspace)
+            )
 
-    def arguments(self, parser: ArgumentParser):
-        # parser.add_argument("--submodules-disable-autoremove", action="store_false")
-        parser.add_argument(
-            "--submodules-disable-cleanup",
-            action="store_false",
-            help="Disable clean up newly created SARIF files",
-        )
-        parser.add_argument(
-            "--submodules-mode",
-            default="sink",
-            help="Submodule plugin mode ('sink' or 'path')",
-        )
+        return self.checkSubmodules()
 
-    def run(self, arguments, **kargvs):
+    def configure(self, arguments):
         workspace = os.path.abspath(arguments.github_workspace)
         working = os.path.abspath(arguments.working)
 
         self.token = arguments.github_token
         self.cleanup = arguments.submodules_disable_cleanup
+        self.compression = arguments.submodules_compression_level
         self.mode = arguments.submodules_mode
+        self.compact = arguments.compact_models
+        self.compact_json = arguments.compact
+        self.artifact_table = arguments.artifact_table
+        self.lookahead = ["artifacts"] if self.artifact_table else []
+        self.cache = arguments.submodules_disable_cache
+        self.instance = arguments.github_instance
+        self.api_url = arguments.github_api_url
+        self.uploads = max(1, arguments.submodules_uploads)
+        self.queue_size = max(1, arguments.submodules_queue_size)
+        self.upload_bytes = arguments.shard_bytes or UPLOAD_MAX_BYTES
+        self.upload_results = arguments.shard_results or UPLOAD_MAX_RESULTS
+        if arguments.submodules_memory_budget:
+            self.memory_budget = arguments.submodules_memory_budget * 1024 * 1024
 
         self.logger.debug(f"Git Workspace :: {workspace}")
         self.logger.debug(f"Working :: {working}")
 
-        submodules = self.getSubmodules(workspace)
-
-        if len(submodules) == 0:
+    def checkSubmodules(self) -> bool:
+        if len(self.submodules) == 0:
             self.logger.warning("No submodules found.")
-            return
+            return False
 
         self.logger.info("Submodules found:")
-        for sub in submodules:
+        for sub in self.submodules:
             self.logger.info(f" >> {sub}")
 
-        for sarif, sarif_file in self.loadSarif(arguments.sarif):
-            self.processSarif(submodules, sarif, sarif_file)
+        return True
+
+    def run(self, arguments, **kargvs):
+        if arguments.submodules_async:
+            asyncio.run(self.runAsync(arguments))
+            return
+
+        if not self.setup(arguments):
+            return
+
+        self.file_cache = loadCache(arguments, [self])
+
+        mapSarifFiles(
+            self.processSarifFile, findSarifFiles(arguments.sarif), jobs=arguments.jobs
+        )
+
+    def processSarifFile(self, sarif_file: str):
+        def process():
+            sarif = loadSarif(sarif_file, compact=self.compact)
+
+            return self.processSarif(self.submodules, sarif, sarif_file)
+
+        processCached(self.file_cache, sarif_file, None, process)
+
+    def processResult(self, run: dict, result: dict) -> dict:
+        if not self.submodule_sarifs:
+            self.submodule_sarifs = self.createSubmoduleBuckets(self.submodules)
+
+        self.partitionResult(
+            self.submodules,
+            self.submodule_sarifs,
+            decodeSarif(result, ResultsModel, compact=self.compact),
+            run_index=self.stream_run_index,
+        )
+        return result
+
+    def startRun(self, run: dict, run_index: int):
+        #  Results are streamed run by run, track which run they belong to
+        self.stream_run, self.stream_run_index = run, run_index
+
+        if self.artifact_table:
+            self.artifact_tables[run_index] = self.classifyArtifacts(
+                self.submodules,
+                [
+                    (artifact.get("location") or {}).get("uri")
+                    for artifact in run.get("artifacts", [])
+                ],
+            )
+
+    def processChunk(self, run: dict, run_index: int, results: list):
+        #  Workers only find the results in a submodule and return their
+        #  indexes, they are bucketed in the main process (`mergeChunk`)
+        if run is not self.stream_run:
+            self.startRun(run, run_index)
+
+        found = []
+        for index, result in enumerate(results):
+            model = decodeSarif(result, ResultsModel, compact=self.compact)
+            for location in self.getResultLocations(model):
+                submodule, _ = self.isLocationInSubmodule(
+                    self.submodules, location, run_index
+                )
+                if submodule:
+                    found.append(index)
+                    break
+        return results, found
+
+    def mergeChunk(self, run: dict, run_index: int, results: list, found: list):
+        #  The plugins which process chunks don't drop results, so the indexes
+        #  are the same in the merged chunk
+        if not self.submodule_sarifs:
+            self.submodule_sarifs = self.createSubmoduleBuckets(self.submodules)
+
+        if run is not self.stream_run:
+            self.startRun(run, run_index)
+
+        for index in found:
+            self.partitionResult(
+                self.submodules,
+                self.submodule_sarifs,
+                decodeSarif(results[index], ResultsModel, compact=self.compact),
+                run_index=run_index,
+            )
+
+    def finishSarif(self, sarif: dict, sarif_file: str) -> bool:
+        self.logger.info(f"Processing SARIF file: {sarif_file}")
+
+        submodule_sarifs, self.submodule_sarifs = self.submodule_sarifs, {}
+        self.stream_run, self.stream_run_index = None, -1
+
+        try:
+            return self.exportSubmoduleSarifs(
+                self.submodules,
+                decodeSarif(sarif, compact=self.compact),
+                submodule_sarifs,
+                sarif_file,
+            )
+        finally:
+            self.artifact_tables = {}
 
     def processSarif(
         self,
@@ -80,100 +360,433 @@ class Submodules(Plugin):
     ):
         self.logger.info(f"Processing SARIF file: {sarif_file}")
 
-        submodule_sarifs = {}
-        for sub in submodules:
-            submodule_sarifs[sub.name] = {}
+        submodule_sarifs = self.partitionSarif(submodules, sarif)
+
+        try:
+            return self.exportSubmoduleSarifs(
+                submodules, sarif, submodule_sarifs, sarif_file
+            )
+        finally:
+            self.artifact_tables = {}
+
+    def createSubmoduleBuckets(self, submodules: List[SubmoduleModel]) -> dict:
+        #  With a memory budget, results are encoded and can spill to disk
+        return {
+            sub.name: ResultSpill() if self.memory_budget else {} for sub in submodules
+        }
+
+    def partitionSarif(self, submodules: List[SubmoduleModel], sarif: SarifModel):
+        submodule_sarifs = self.createSubmoduleBuckets(submodules)
 
-        for run in sarif.runs:
+        for run_index, run in enumerate(sarif.runs):
             tool = run.tool.driver
             self.logger.info(f"Processing tool: {tool.name} ({tool.semanticVersion})")
 
+            if self.artifact_table:
+                self.artifact_tables[run_index] = self.classifyArtifacts(
+                    submodules,
+                    [
+                        artifact.location.uri if artifact.location else None
+                        for artifact in run.artifacts
+                    ],
+                )
+
             for result in run.results:
-                self.logger.debug(f"Rule('{result.ruleId}')")
+                self.partitionResult(
+                    submodules, submodule_sarifs, result, run_index=run_index
+                )
 
-                # Modes
-                if self.mode == "sink":
-                    #  Get the sink of the query
-                    location = result.locations[len(result.locations) - 1]
+        return submodule_sarifs
 
-                    uri = location.physicalLocation.artifactLocation.uri
-                    self.logger.debug(f"Location('{uri}')")
+    def classifyArtifacts(self, submodules: List[SubmoduleModel], uris: list):
+        #  Each distinct artifact is only looked up once per run
+        return [
+            self.isFileInSubmodule(submodules, uri) if uri else (None, None)
+            for uri in uris
+        ]
 
-                    submodule, new_location_uri = self.isFileInSubmodule(
-                        submodules, uri
+    def isLocationInSubmodule(
+        self, submodules: List[SubmoduleModel], location, run_index: int = 0
+    ):
+        physical = location.physicalLocation
+        artifact = physical.artifactLocation if physical else None
+        if not artifact:
+            return (None, None)
+
+        #  Resolve through `run.artifacts`, this also covers index only locations
+        table = self.artifact_tables.get(run_index)
+        if table is not None and artifact.index is not None:
+            if 0 <= artifact.index < len(table):
+                return table[artifact.index]
+
+        if not artifact.uri:
+            return (None, None)
+        return self.isFileInSubmodule(submodules, artifact.uri)
+
+    def getResultLocations(self, result: ResultsModel):
+        # Modes
+        if self.mode == "sink":
+            #  Get the sink of the query
+            return result.locations[-1:]
+        elif self.mode == "path":
+            #  If any of the locations in the path are in the submodule
+            return result.locations
+        raise Exception(f"Unknown Mode: {self.mode}")
+
+    def partitionResult(
+        self,
+        submodules: List[SubmoduleModel],
+        submodule_sarifs: dict,
+        result: ResultsModel,
+        run_index: int = 0,
+    ):
+        #  Buckets the result by submodule, run and rule. The result itself is
+        #  not modified, locations are rewritten when the SARIF is created.
+        self.logger.debug(f"Rule('{result.ruleId}')")
+
+        found = []
+        for location in self.getResultLocations(result):
+            submodule, _ = self.isLocationInSubmodule(submodules, location, run_index)
+
+            if submodule and submodule not in found:
+                self.logger.info(f"Result is in Submodule: {submodule.name}")
+                found.append(submodule)
+
+                runs = submodule_sarifs[submodule.name]
+                if isinstance(runs, ResultSpill):
+                    self.bufferResult(
+                        submodules, submodule_sarifs, submodule, result, run_index
                     )
+                    continue
 
-                    if submodule:
-                        self.logger.info(f"Result is in Submodule: {submodule.name}")
+                rules = runs.setdefault(run_index, {})
+                rules.setdefault(result.ruleId, []).append(result)
 
-                        location.physicalLocation.artifactLocation.uri = (
-                            new_location_uri
-                        )
+            #  TODO: Pop result if --submodules-disable-autoremove is true
 
-                        if not submodule_sarifs[submodule.name].get(result.ruleId):
-                            submodule_sarifs[submodule.name][result.ruleId] = []
+    def bufferResult(
+        self,
+        submodules: List[SubmoduleModel],
+        submodule_sarifs: dict,
+        submodule: SubmoduleModel,
+        result: ResultsModel,
+        run_index: int = 0,
+    ):
+        #  Results are encoded as they are written in the submodule SARIF file,
+        #  over the memory budget every submodule's results are spilled to disk
+        submodule_result = self.createSubmoduleResult(
+            submodules, submodule, result, run_index=run_index
+        )
+        data = encodeSarif(dataclassAsDict(submodule_result), compact=True)
+        self.buffered += submodule_sarifs[submodule.name].append(
+            run_index, result.ruleId, data
+        )
 
-                        submodule_sarifs[submodule.name][result.ruleId].append(result)
+        if self.buffered > self.memory_budget:
+            self.logger.info("Memory budget used, spilling submodule results to disk")
+            for buffer in submodule_sarifs.values():
+                self.buffered -= buffer.spill()
 
-                elif self.mode == "path":
-                    #  If any of the locations in the path are in the submodule
-                    for location in result.locations:
-                        uri = location.physicalLocation.artifactLocation.uri
-                        self.logger.debug(f"Location('{uri}')")
+    def createSubmoduleResult(
+        self,
+        submodules: List[SubmoduleModel],
+        submodule: SubmoduleModel,
+        result: ResultsModel,
+        run_index: int = 0,
+    ) -> ResultsModel:
+        #  Copy of the result with the submodule's locations made relative to
+        #  the submodule, everything else is shared with the original result
+        sink_locations = set(map(id, self.getResultLocations(result)))
+
+        locations = []
+        for location in result.locations:
+            if id(location) in sink_locations:
+                physical = location.physicalLocation
+
+                match, new_location_uri = self.isLocationInSubmodule(
+                    submodules, location, run_index
+                )
+                if match is submodule:
+                    location = replace(
+                        location,
+                        physicalLocation=replace(
+                            physical,
+                            artifactLocation=replace(
+                                physical.artifactLocation, uri=new_location_uri
+                            ),
+                        ),
+                    )
+            locations.append(location)
 
-                        submodule, new_location_uri = self.isFileInSubmodule(
-                            submodules, uri
-                        )
+        return replace(result, locations=locations)
 
-                        if submodule:
-                            self.logger.info(
-                                f"Result is in Submodule: {submodule.name}"
-                            )
+    def createSubmoduleSarif(
+        self,
+        submodules: List[SubmoduleModel],
+        submodule: SubmoduleModel,
+        sarif: SarifModel,
+        submodule_runs: dict,
+    ) -> SarifModel:
+        #  The tool, invocations, etc. are shared with the original
+        runs = []
+        for run_index, run in enumerate(sarif.runs):
+            results = []
+            for rule_id, rule_results in submodule_runs.get(run_index, {}).items():
+                self.logger.debug(
+                    f"New Submodule Result :: {rule_id} ({len(rule_results)})"
+                )
+
+                results.extend(
+                    self.createSubmoduleResult(
+                        submodules, submodule, result, run_index=run_index
+                    )
+                    for result in rule_results
+                )
 
-                            location.physicalLocation.artifactLocation.uri = (
-                                new_location_uri
-                            )
+            table = self.artifact_tables.get(run_index)
+            if table is None:
+                runs.append(replace(run, results=results))
+                continue
 
-                            if not submodule_sarifs[submodule.name].get(result.ruleId):
-                                submodule_sarifs[submodule.name][result.ruleId] = []
+            #  Only the submodule's artifacts are copied, the rest are shared
+            artifacts = []
+            for artifact, (match, new_location_uri) in zip(run.artifacts, table):
+                if match is submodule:
+                    artifact = replace(
+                        artifact,
+                        location=replace(artifact.location, uri=new_location_uri),
+                    )
+                artifacts.append(artifact)
 
-                            submodule_sarifs[submodule.name][result.ruleId].append(
-                                result
-                            )
+            runs.append(replace(run, results=results, artifacts=artifacts))
 
-                        #  TODO: Pop result if --submodules-disable-autoremove is true
-                else:
-                    raise Exception(f"Unknown Mode: {self.mode}")
+        return replace(sarif, runs=runs)
 
-        for name, submodule_locations in submodule_sarifs.items():
-            if not submodule_locations:
+    def exportSubmoduleSarifs(
+        self,
+        submodules: List[SubmoduleModel],
+        sarif: SarifModel,
+        submodule_sarifs: dict,
+        sarif_file: str,
+    ) -> bool:
+        #  Returns if every submodule SARIF file was uploaded
+        published = True
+        for submodule, submodule_sarif, submod_file in self.createSubmoduleSarifs(
+            submodules, sarif, submodule_sarifs, sarif_file
+        ):
+            if not self.publishSarifFile(
+                submodule, submodule_sarif, sarif_file=submod_file
+            ):
+                published = False
+
+        return self.waitForUploads() and published
+
+    def createSubmoduleSarifs(
+        self,
+        submodules: List[SubmoduleModel],
+        sarif: SarifModel,
+        submodule_sarifs: dict,
+        sarif_file: str,
+    ) -> list:
+        #  Returns the (submodule, SARIF, SARIF file) to publish, without
+        #  cleanup the SARIF is written next to the original SARIF file
+        retval = []
+        for name, submodule_runs in submodule_sarifs.items():
+            if not submodule_runs:
                 continue
 
             submodule = next((x for x in submodules if x.name == name), None)
 
             self.logger.info(f"Creating SARIF file for: {name}")
-            # Create a deep copy of the SARIF file
-            submodule_sarif: SarifModel = copy.copy(sarif)
+            if isinstance(submodule_runs, ResultSpill):
+                retval.append(
+                    self.assembleSubmoduleSarif(
+                        submodules, submodule, sarif, submodule_runs, sarif_file
+                    )
+                )
+                continue
 
-            for run in submodule_sarif.runs:
-                #  Clear the existing results
-                run.results.clear()
+            submodule_sarif = self.createSubmoduleSarif(
+                submodules, submodule, sarif, submodule_runs
+            )
 
-                for rule_id, results in submodule_locations.items():
-                    self.logger.debug(
-                        f"New Submodule Result :: {rule_id} ({len(results)})"
-                    )
+            submod_file = None
+            if not self.cleanup:
+                #  With cleanup it's packaged in memory, and never written to disk
+                submod_file = self.createSubmoduleFileName(name, sarif_file)
+                exportSarif(submod_file, submodule_sarif, compact=self.compact_json)
 
-                    run.results.extend(results)
+            retval.append((submodule, submodule_sarif, submod_file))
 
-            submod_file = self.createSubmoduleFileName(name, sarif_file)
-            exportSarif(submod_file, submodule_sarif)
+        self.buffered = 0
+        return retval
 
-            self.publishSarifFile(submodule, submodule_sarif, sarif_file=submod_file)
+    def assembleSubmoduleSarif(
+        self,
+        submodules: List[SubmoduleModel],
+        submodule: SubmoduleModel,
+        sarif: SarifModel,
+        spill: ResultSpill,
+        sarif_file: str,
+    ) -> tuple:
+        #  The SARIF file is streamed from the encoded results to disk, next to
+        #  the original SARIF file or to a temporary file with cleanup. The
+        #  SARIF returned only has the runs (without results).
+        submodule_sarif = self.createSubmoduleSarif(submodules, submodule, sarif, {})
+
+        if self.cleanup:
+            handle, submod_file = tempfile.mkstemp(prefix="sarif-", suffix=".sarif")
+            os.close(handle)
+        else:
+            submod_file = self.createSubmoduleFileName(submodule.name, sarif_file)
+
+        try:
+            with metrics.stage("export", submod_file):
+                results = self.writeSpilledSarif(
+                    submod_file, sarifAsDict(submodule_sarif), spill
+                )
+        finally:
+            spill.close()
+
+        self.assembled[submod_file] = (results, self.cleanup)
+        return (submodule, submodule_sarif, submod_file)
+
+    def writeSpilledSarif(self, path: str, data: dict, spill: ResultSpill) -> list:
+        #  Returns the number of results of each run
+        results = []
+        with open(path, "w") as handle:
+            writer = JsonStreamWriter(handle)
+            writer.start("{")
+
+            for key, value in data.items():
+                if key != "runs":
+                    writer.value(value, key=key)
+                    continue
+
+                writer.start("[", key=key)
+                for run_index, run in enumerate(value):
+                    writer.start("{")
+                    for run_key, run_value in run.items():
+                        if run_key != "results":
+                            writer.value(run_value, key=run_key)
+
+                    writer.start("[", key="results")
+                    for result in spill.read(run_index):
+                        writer.raw(result.decode())
+                    writer.end("]")
+                    writer.end("}")
+
+                    results.append(spill.count(run_index))
+                writer.end("]")
+
+            writer.end("}")
+        return results
+
+    def splitSarif(
+        self, submodules: List[SubmoduleModel], sarif: SarifModel, sarif_file: str
+    ) -> list:
+        self.logger.info(f"Processing SARIF file: {sarif_file}")
 
-            if self.cleanup:
-                self.logger.info(f"Cleaning up SARIF file: {submod_file}")
-                os.remove(submod_file)
+        submodule_sarifs = self.partitionSarif(submodules, sarif)
+        try:
+            return self.createSubmoduleSarifs(
+                submodules, sarif, submodule_sarifs, sarif_file
+            )
+        finally:
+            self.artifact_tables = {}
+
+    async def runAsync(self, arguments):
+        #  Discovery, splitting SARIF files and uploads run concurrently. The
+        #  bounded queue of submodule SARIF files stops splitting from getting
+        #  ahead of the uploads.
+        self.configure(arguments)
+        self.file_cache = loadCache(arguments, [self])
+
+        discovery = asyncio.create_task(
+            self.getSubmodulesAsync(os.path.abspath(arguments.github_workspace))
+        )
+        queue = asyncio.Queue(maxsize=self.queue_size)
+
+        sarif_files = findSarifFiles(arguments.sarif)
+
+        await asyncio.gather(
+            self.produceSubmoduleSarifs(discovery, sarif_files, queue),
+            *[self.consumeSubmoduleSarifs(queue) for _ in range(self.uploads)],
+        )
+
+    async def produceSubmoduleSarifs(self, discovery, sarif_files: list, queue):
+        discovered = False
+        try:
+            for sarif_file in sarif_files:
+                sarif_hash = None
+                if self.file_cache:
+                    sarif_hash = await asyncio.to_thread(hashFile, sarif_file)
+                    if self.file_cache.isProcessed(sarif_hash):
+                        self.logger.info(
+                            f"Skipping already processed SARIF file: {sarif_file}"
+                        )
+                        continue
+
+                #  The first SARIF file is loaded while submodules are discovered
+                sarif = await asyncio.to_thread(loadSarif, sarif_file, self.compact)
+
+                if not discovered:
+                    self.submodules, discovered = await discovery, True
+                    if not self.checkSubmodules():
+                        return
+
+                with metrics.stage("split", sarif_file):
+                    uploads = await asyncio.to_thread(
+                        self.splitSarif, self.submodules, sarif, sarif_file
+                    )
+                del sarif
+
+                self.pending_files[sarif_file] = [len(uploads), sarif_hash, True]
+                if not uploads:
+                    self.pending_files[sarif_file][0] = 1
+                    self.finishUpload(sarif_file, True)
+
+                for submodule, submodule_sarif, submod_file in uploads:
+                    await queue.put(
+                        (sarif_file, submodule, submodule_sarif, submod_file)
+                    )
+        finally:
+            if not discovered:
+                discovery.cancel()
+            for _ in range(self.uploads):
+                await queue.put(None)
+
+    async def consumeSubmoduleSarifs(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            sarif_file, submodule, submodule_sarif, submod_file = item
+            uploaded = False
+            try:
+                uploads = await asyncio.to_thread(
+                    self.prepareUploads, submodule, submodule_sarif, submod_file
+                )
+                uploaded = bool(uploads)
+                for upload in uploads:
+                    res = await asyncio.to_thread(self.postSarif, submodule, *upload)
+                    uploaded = uploaded and res.ok
+            finally:
+                self.finishUpload(sarif_file, uploaded)
+
+    def finishUpload(self, sarif_file: str, uploaded: bool):
+        #  Records the SARIF file in the cache once all its uploads are done,
+        #  if they all succeeded
+        pending = self.pending_files[sarif_file]
+        pending[0] -= 1
+        pending[2] = pending[2] and uploaded
+        if pending[0] > 0:
+            return
+
+        del self.pending_files[sarif_file]
+        if self.file_cache and pending[1] and pending[2]:
+            self.file_cache.record(sarif_file, pending[1])
 
     def createSubmoduleFileName(self, name: str, sarif_file: str):
         file_name, file_ext = os.path.splitext(sarif_file)
@@ -181,19 +794,75 @@ class Submodules(Plugin):
         return f"{file_name}-{name}{file_ext}"
 
     def isFileInSubmodule(self, submodules: List[SubmoduleModel], file: str):
-        for sub in submodules:
-            if file.startswith(sub.path):
-                new_path = file.replace(sub.path + "/", "", 1)
-                return (sub, new_path)
-        return (None, None)
+        index = self.submodule_index
+        if not index or index.submodules is not submodules:
+            self.submodule_index = SubmoduleIndex(submodules)
+
+        return self.submodule_index.lookup(file)
 
     def getSubmodules(self, workspace: str):
-        subs = []
+        head, git_dir = self.getGitHead(workspace)
+        cache_file = None
+        if self.cache and head:
+            cache_file = os.path.join(git_dir, "sariftoolkit-submodules.json")
+            subs = self.loadSubmodulesCache(cache_file, head, workspace)
+            if subs is not None:
+                return subs
+
         command = ["git", "submodule", "status", "--recursive"]
         result = subprocess.run(command, stdout=subprocess.PIPE, cwd=workspace)
-        data = result.stdout.decode().split("\n")
+        subs = self.parseSubmodules(workspace, result.stdout.decode())
+
+        if cache_file:
+            self.saveSubmodulesCache(cache_file, head, workspace, subs)
+
+        return subs
+
+    async def getSubmodulesAsync(self, workspace: str):
+        #  Same as `getSubmodules`, without blocking on the git processes
+        with metrics.stage("discovery"):
+            _, stdout = await self.runGitAsync(
+                ["git", "rev-parse", "--absolute-git-dir", "HEAD"], workspace
+            )
+            head, git_dir = self.parseGitHead(stdout)
+
+            cache_file = None
+            if self.cache and head:
+                cache_file = os.path.join(git_dir, "sariftoolkit-submodules.json")
+                subs = await asyncio.to_thread(
+                    self.loadSubmodulesCache, cache_file, head, workspace
+                )
+                if subs is not None:
+                    return subs
+
+            _, stdout = await self.runGitAsync(
+                ["git", "submodule", "status", "--recursive"], workspace
+            )
+            subs = await asyncio.to_thread(self.parseSubmodules, workspace, stdout)
 
-        for line in data:
+            if cache_file:
+                await asyncio.to_thread(
+                    self.saveSubmodulesCache, cache_file, head, workspace, subs
+                )
+
+            return subs
+
+    async def runGitAsync(self, command: list, cwd: str):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=cwd,
+        )
+        stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            return (process.returncode, "")
+        return (process.returncode, stdout.decode())
+
+    def parseSubmodules(self, workspace: str, output: str):
+        #  Parses the output of `git submodule status --recursive`
+        subs = []
+        for line in output.split("\n"):
             line = line.strip()
             if line == "" or line.startswith("-") or line.startswith("+"):
                 continue
@@ -204,7 +873,7 @@ class Submodules(Plugin):
             url = self.getGitRemoteUrl(full_path)
 
             if not url.scheme and not url.netloc:
-                #  Assume SSH like URL...
+                #  Assume SSH like URL...
                 _, giturl = url.path.split(":")
             else:
                 giturl = url.path.replace("/", "", 1)
@@ -223,53 +892,379 @@ class Submodules(Plugin):
 
         return subs
 
+    def getGitHead(self, workspace: str):
+        command = ["git", "rev-parse", "--absolute-git-dir", "HEAD"]
+        result = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=workspace
+        )
+        if result.returncode != 0:
+            return (None, None)
+
+        return self.parseGitHead(result.stdout.decode())
+
+    def parseGitHead(self, output: str):
+        #  `git rev-parse --absolute-git-dir HEAD` prints the git dir and HEAD
+        if not output.strip():
+            return (None, None)
+
+        #  One per line, the git dir can contain spaces
+        git_dir, head = output.strip("\n").splitlines()
+        return (head, git_dir)
+
+    def getSubmodulesState(self, workspace: str, submodules: list) -> str:
+        #  Hash of `.gitmodules` and of the checkout of every submodule, the
+        #  cache is also invalidated by `git submodule update/sync/deinit`
+        state = hashlib.sha256()
+        for path in [""] + [sub.path for sub in submodules]:
+            full_path = os.path.join(workspace, path)
+            git_dir = self.getGitDir(full_path)
+
+            state.update(f"{path}\0".encode())
+            for file in (
+                os.path.join(full_path, ".gitmodules"),
+                os.path.join(git_dir, "config") if git_dir and path else None,
+            ):
+                if file and os.path.isfile(file):
+                    with open(file, "rb") as handle:
+                        state.update(handle.read())
+                state.update(b"\0")
+
+            if path:
+                state.update(f"{self.readGitHead(git_dir)}\0".encode())
+        return state.hexdigest()
+
+    def readGitHead(self, git_dir: str):
+        #  Commit (and branch) checked out, without spawning `git rev-parse`
+        head_file = os.path.join(git_dir, "HEAD") if git_dir else None
+        if not head_file or not os.path.isfile(head_file):
+            return None
+
+        with open(head_file, "r") as handle:
+            head = handle.read().strip()
+        if not head.startswith("ref:"):
+            return head
+
+        ref = head[len("ref:") :].strip()
+        ref_file = os.path.join(git_dir, ref)
+        if os.path.isfile(ref_file):
+            with open(ref_file, "r") as handle:
+                return f"{ref} {handle.read().strip()}"
+
+        packed_refs = os.path.join(git_dir, "packed-refs")
+        if os.path.isfile(packed_refs):
+            with open(packed_refs, "r") as handle:
+                for line in handle:
+                    if line.rstrip("\n").endswith(" " + ref):
+                        return f"{ref} {line.split()[0]}"
+        return ref
+
+    def loadSubmodulesCache(self, path: str, head: str, workspace: str):
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as handle:
+                cache = json.load(handle)
+        except ValueError:
+            self.logger.warning(f"Ignoring invalid submodules cache: {path}")
+            return None
+
+        if cache.get("head") != head:
+            return None
+
+        submodules = [SubmoduleModel(**sub) for sub in cache.get("submodules", [])]
+        if cache.get("state") != self.getSubmodulesState(workspace, submodules):
+            return None
+
+        self.logger.debug(f"Loaded submodules from cache :: {path}")
+        return submodules
+
+    def saveSubmodulesCache(
+        self, path: str, head: str, workspace: str, submodules: list
+    ):
+        self.logger.debug(f"Saving submodules cache :: {path}")
+        with open(path, "w") as handle:
+            json.dump(
+                {
+                    "head": head,
+                    "state": self.getSubmodulesState(workspace, submodules),
+                    "submodules": [asdict(sub) for sub in submodules],
+                },
+                handle,
+            )
+
     def getGitRemoteUrl(self, path: str):
         self.logger.debug(f"Git Remote Path :: {path}")
 
-        command = ["git", "config", "--get", "remote.origin.url"]
-        result = subprocess.run(command, stdout=subprocess.PIPE, cwd=path)
-        url = result.stdout.decode().strip()
+        #  Read the config directly instead of spawning `git config`
+        url = self.readGitRemoteUrl(self.getGitDir(path))
+
+        if url is None:
+            command = ["git", "config", "--get", "remote.origin.url"]
+            result = subprocess.run(command, stdout=subprocess.PIPE, cwd=path)
+            url = result.stdout.decode().strip()
 
         return urllib.parse.urlparse(url)
 
+    def getGitDir(self, path: str):
+        git_path = os.path.join(path, ".git")
+
+        if os.path.isdir(git_path):
+            return git_path
+
+        if os.path.isfile(git_path):
+            #  Submodules use a `gitdir: ../.git/modules/<name>` file
+            with open(git_path, "r") as handle:
+                line = handle.readline().strip()
+            if line.startswith("gitdir:"):
+                return os.path.join(path, line[len("gitdir:") :].strip())
+
+        return None
+
+    def readGitRemoteUrl(self, git_dir: str):
+        config = os.path.join(git_dir, "config") if git_dir else None
+        if not config or not os.path.isfile(config):
+            return None
+
+        section = None
+        with open(config, "r") as handle:
+            for line in handle:
+                line = line.strip()
+                if line == "" or line[0] in "#;":
+                    continue
+
+                if line.startswith("["):
+                    section = line.strip("[]").strip()
+                    continue
+
+                key, _, value = line.partition("=")
+                if section == 'remote "origin"' and key.strip().lower() == "url":
+                    return value.strip().strip('"')
+
+        return None
+
     def packageSarif(self, path: str):
         if os.path.exists(path):
             with open(path, "rb") as handle:
-                content = gzip.compress(handle.read())
+                content = gzip.compress(handle.read(), compresslevel=self.compression)
             return base64.b64encode(content).decode()
 
+    def packageSarifModel(self, sarif: SarifModel):
+        #  Serialize and compress in memory without a temp file
+        return self.packageSarifData(sarifAsDict(sarif))
+
+    def packageSarifData(self, data: dict):
+        #  Serialize straight into the gzip compressor
+        buffer = io.BytesIO()
+        with gzip.GzipFile(
+            fileobj=buffer, mode="wb", compresslevel=self.compression
+        ) as compressor:
+            dumpSarif(compressor, data, compact=True)
+
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def packageSarifShards(self, sarif: SarifModel, sarif_file: str = None):
+        #  SARIF files over the upload limits are split into multiple uploads
+        if sarif_file:
+            package = self.packageSarif(sarif_file)
+        else:
+            package = self.packageSarifModel(sarif)
+
+        #  Results of assembled SARIF files are only in the file
+        assembled = self.assembled.get(sarif_file)
+        if assembled:
+            results = assembled[0]
+        else:
+            results = [len(run.results) for run in sarif.runs]
+
+        if (
+            len(package) * 3 // 4 <= self.upload_bytes
+            and len(sarif.runs) <= UPLOAD_MAX_RUNS
+            and all(count <= self.upload_results for count in results)
+        ):
+            return [package]
+
+        if assembled:
+            with open(sarif_file, "r") as handle:
+                data = json.load(handle)
+        else:
+            data = sarifAsDict(sarif)
+
+        shards = shardSarif(
+            data,
+            max_bytes=self.upload_bytes,
+            max_results=self.upload_results,
+            max_runs=UPLOAD_MAX_RUNS,
+            level=self.compression,
+        )
+        return [self.packageSarifData(shard) for shard in shards]
+
     def publishSarifFile(
         self,
         submodule: SubmoduleModel,
         sarif: SarifModel,
-        sarif_file: str,
-        instance: str = "https://github.com",
+        sarif_file: str = None,
+        instance: str = None,
+    ):
+        #  Packages the SARIF file and queues the uploads, uploads are finished
+        #  by `waitForUploads`
+        futures = []
+        for upload in self.prepareUploads(submodule, sarif, sarif_file, instance):
+            if not self.uploader:
+                self.uploader = ThreadPoolExecutor(max_workers=self.uploads)
+
+            futures.append(self.uploader.submit(self.postSarif, submodule, *upload))
+
+        self.pending_uploads.extend(futures)
+        return futures
+
+    def prepareUploads(
+        self,
+        submodule: SubmoduleModel,
+        sarif: SarifModel,
+        sarif_file: str = None,
+        instance: str = None,
+    ):
+        #  Returns the upload url and the packaged SARIF file for every shard
+        try:
+            return self.createUploads(submodule, sarif, sarif_file, instance)
+        finally:
+            self.releaseSarifFile(sarif_file)
+
+    def releaseSarifFile(self, sarif_file: str):
+        #  Temporary assembled SARIF files are removed once they are packaged
+        temporary = self.assembled.pop(sarif_file, (None, False))[1]
+        if temporary and os.path.exists(sarif_file):
+            os.remove(sarif_file)
+
+    def createUploads(
+        self,
+        submodule: SubmoduleModel,
+        sarif: SarifModel,
+        sarif_file: str = None,
+        instance: str = None,
     ):
         if not self.token:
             self.logger.warning("Failed to find access token, skipping publishing...")
-            return
+            return []
 
         self.logger.info(f"Publishing SARIF to submodule: {submodule.name}")
-        headers = {
-            "Accept": "application/vnd.github.v3+json",
-            "Authorization": "token " + self.token,
-        }
         owner, repo = submodule.url.split("/")
-        if instance == "https://github.com":
-            api_instance = "https://api.github.com"
-        else:
-            api_instance = instance + "/api"
 
-        url = f"{api_instance}/repos/{owner}/{repo}/code-scanning/sarifs"
+        url = f"{self.getApiUrl(instance)}/repos/{owner}/{repo}/code-scanning/sarifs"
         self.logger.debug(f"Publishing SARIF file to endpoint: {url}")
 
         data = {
             "commit_sha": submodule.commit,
             "ref": submodule.branch,
-            "sarif": self.packageSarif(sarif_file),
             "tool_name": sarif.runs[0].tool.driver.name,
         }
 
-        res = requests.post(url, json=data, headers=headers)
+        with metrics.stage("export", sarif_file or submodule.name):
+            packages = self.packageSarifShards(sarif, sarif_file)
+
+        return [(url, dict(data, sarif=package)) for package in packages]
+
+    def getApiUrl(self, instance: str = None) -> str:
+        instance = (instance or self.instance).rstrip("/")
+        if self.api_url and instance == self.instance.rstrip("/"):
+            return self.api_url.rstrip("/")
+
+        if instance == "https://github.com":
+            return "https://api.github.com"
+        #  GitHub Enterprise Server
+        return instance + "/api/v3"
+
+    def waitForUploads(self) -> bool:
+        #  Returns if all the uploads succeeded
+        pending_uploads, self.pending_uploads = self.pending_uploads, []
+        uploaded = True
+        try:
+            #  Every upload is waited for, even after one of them failed
+            for future in pending_uploads:
+                try:
+                    uploaded = future.result().ok and uploaded
+                except Exception as err:
+                    self.logger.error(f"Failed to upload SARIF file: {err}")
+                    uploaded = False
+        finally:
+            if self.uploader:
+                self.uploader.shutdown()
+                self.uploader = None
+        return uploaded
+
+    def getSession(self) -> requests.Session:
+        with _session_lock:
+            if not self.session:
+                #  Reuse connections, one per concurrent upload
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.uploads)
+
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(
+                    {
+                        "Accept": "application/vnd.github.v3+json",
+                        "Authorization": "token " + self.token,
+                    }
+                )
+                self.session = session
+        return self.session
+
+    def postSarif(self, submodule: SubmoduleModel, url: str, data: dict):
+        with metrics.stage("upload", submodule.name):
+            return self.postSarifWithRetries(submodule, url, data)
+
+    def postSarifWithRetries(self, submodule: SubmoduleModel, url: str, data: dict):
+        session = self.getSession()
+
+        for attempt in range(self.retries + 1):
+            try:
+                res = session.post(url, json=data, timeout=60)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt == self.retries:
+                    raise
+                delay = self.getRetryDelay(None, attempt)
+                self.logger.warning(f"Upload failed ({err}), retrying in {delay}s")
+                time.sleep(delay)
+                continue
+
+            if res.ok:
+                self.logger.info(f"Uploaded SARIF file to submodule: {submodule.name}")
+                return res
+
+            if attempt == self.retries or not self.isRetryable(res):
+                break
+
+            delay = self.getRetryDelay(res, attempt)
+            self.logger.warning(
+                f"Upload failed ({res.status_code}), retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+        self.logger.error(
+            f"Failed to upload SARIF file to submodule: {submodule.name} "
+            f"({res.status_code})"
+        )
+        return res
+
+    def isRetryable(self, response: requests.Response) -> bool:
+        if response.status_code in RETRY_STATUSES:
+            return True
+        #  GitHub rate limits can also be reported as forbidden
+        return response.status_code == 403 and (
+            "Retry-After" in response.headers
+            or response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def getRetryDelay(self, response: requests.Response, attempt: int) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), MAX_RETRY_WAIT)
+
+            reset = response.headers.get("X-RateLimit-Reset", "")
+            if response.headers.get("X-RateLimit-Remaining") == "0" and reset.isdigit():
+                return min(max(float(reset) - time.time(), 0.0) + 1, MAX_RETRY_WAIT)
 
-        self.logger.info("Uploaded SARIF file to submodule")
+        return min(self.backoff * (2**attempt), MAX_RETRY_WAIT)
@@ -0,0 +1,291 @@
+import os
+import re
+import json
+import mmap
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sariftoolkit.metrics import metrics
+from sariftoolkit.sarif.models import ResultsModel
+
+
+logger = logging.getLogger("sarif")
+
+INDEX_VERSION = 1
+
+CHUNK_SIZE = 1024 * 1024
+
+#  JSON strings and the structural characters, everything else is skipped
+TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]:,]')
+SEPARATORS = re.compile(rb"[ \t\r\n,]*")
+
+
+def decodeItems(buffer, start: int) -> Iterator[Tuple[int, int, Any]]:
+    #  Decodes the values of the array starting at `start` one at a time and
+    #  yields their byte offsets. The buffer is decoded as latin-1 so that
+    #  character offsets are byte offsets, strings with non ASCII characters
+    #  have to be decoded again from the bytes.
+    decoder = json.JSONDecoder()
+    position = start + 1
+    base, text = position, ""
+
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer[position : position + 1] in (b"]", b""):
+            return
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(text, position - base)
+                break
+            except json.JSONDecodeError:
+                if base + len(text) >= len(buffer):
+                    raise
+                pending = base + len(text) - position
+                size = max(CHUNK_SIZE, pending * 2)
+                base, text = position, buffer[position : position + size].decode(
+                    "latin-1"
+                )
+
+        yield position, base + end, value
+        position = base + end
+
+
+def decodeString(buffer, start: int, end: int, value: str, getter) -> str:
+    #  Strings decoded as latin-1 are only correct when they're ASCII
+    if value is None or value.isascii():
+        return value
+    return getter(json.loads(buffer[start:end]))
+
+
+def getRule(result: dict) -> str:
+    return result.get("ruleId") or (result.get("rule") or {}).get("id")
+
+
+def getPrimaryUri(result: dict) -> str:
+    for location in result.get("locations", [])[:1]:
+        artifact = location.get("physicalLocation", {}).get("artifactLocation", {})
+        return artifact.get("uri")
+    return None
+
+
+def getPrimaryArtifactIndex(result: dict) -> int:
+    for location in result.get("locations", [])[:1]:
+        artifact = location.get("physicalLocation", {}).get("artifactLocation", {})
+        return artifact.get("index")
+    return None
+
+
+def getArtifactUri(artifact: dict) -> str:
+    return (artifact.get("location") or {}).get("uri")
+
+
+def scanSarif(buffer) -> Tuple[List[list], Dict[int, List[str]]]:
+    #  Walks the JSON structure of the SARIF file and returns the byte offsets,
+    #  rule, primary uri and artifact index of every `runs[i].results[j]` and
+    #  the artifact uris of each run. Only results and artifacts are decoded.
+    results = []
+    artifacts = {}
+
+    #  Objects are [key, expecting key], arrays are [index]
+    stack = []
+    position = 0
+
+    while True:
+        match = TOKENS.search(buffer, position)
+        if not match:
+            break
+        token = match.group()
+        position = match.end()
+
+        if token[0:1] == b'"':
+            if stack and len(stack[-1]) == 2 and stack[-1][1]:
+                stack[-1] = [json.loads(token), False]
+        elif token == b",":
+            if len(stack[-1]) == 2:
+                stack[-1][1] = True
+            else:
+                stack[-1][0] += 1
+        elif token == b"{":
+            stack.append([None, True])
+        elif token == b"[":
+            #  The closing bracket of decoded arrays is still read by the scanner
+            stack.append([0])
+            path = [frame[0] for frame in stack[:-1]]
+            if len(path) != 3 or path[0] != "runs":
+                continue
+
+            if path[2] == "results":
+                for index, (start, end, result) in enumerate(
+                    decodeItems(buffer, match.start())
+                ):
+                    rule = decodeString(buffer, start, end, getRule(result), getRule)
+                    uri = decodeString(
+                        buffer, start, end, getPrimaryUri(result), getPrimaryUri
+                    )
+                    artifact = getPrimaryArtifactIndex(result)
+                    results.append([path[1], index, start, end, rule, uri, artifact])
+                    position = end
+
+            elif path[2] == "artifacts":
+                artifacts[path[1]] = uris = []
+                for start, end, artifact in decodeItems(buffer, match.start()):
+                    uris.append(
+                        decodeString(
+                            buffer, start, end, getArtifactUri(artifact), getArtifactUri
+                        )
+                    )
+                    position = end
+
+        elif token in (b"}", b"]"):
+            stack.pop()
+
+    return results, artifacts
+
+
+@dataclass
+class SarifIndex:
+    #  Byte offsets of each result in a SARIF file, keyed by ruleId and by the
+    #  uri of the primary location, so only matching results are decoded
+    path: str
+    size: int = 0
+    mtime: int = 0
+
+    #  [run index, result index, start offset, end offset]
+    entries: List[list] = field(default_factory=list)
+    #  ruleId / uri -> entry indexes
+    rules: Dict[str, List[int]] = field(default_factory=dict)
+    uris: Dict[str, List[int]] = field(default_factory=dict)
+
+    def isValid(self) -> bool:
+        #  The index is only valid for the SARIF file it was built from
+        stat = os.stat(self.path)
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+    def save(self, path: str):
+        logger.debug(f"Writing SARIF index: {path}")
+        data = {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime": self.mtime,
+            "entries": self.entries,
+            "rules": self.rules,
+            "uris": self.uris,
+        }
+        with open(path, "w") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+
+    def find(self, rules: List[str] = None, uris: List[str] = None) -> List[int]:
+        #  Entries matching any of the rules and any of the uris
+        matches = None
+        for keys, table in ((rules, self.rules), (uris, self.uris)):
+            if keys is None:
+                continue
+            found = set()
+            for key in keys:
+                found.update(table.get(key, []))
+            matches = found if matches is None else matches & found
+
+        if matches is None:
+            return list(range(len(self.entries)))
+        return sorted(matches)
+
+    def readResults(self, entries: List[int]) -> Iterator[dict]:
+        #  Decodes the results of the entries (results in file order)
+        with open(self.path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for entry in entries:
+                    _, _, start, end = self.entries[entry]
+                    yield json.loads(buffer[start:end])
+
+    def query(
+        self, rules: List[str] = None, uris: List[str] = None, compact: bool = False
+    ) -> Iterator[Tuple[int, int, ResultsModel]]:
+        #  Yields (run index, result index, result) for the matching results
+        from sariftoolkit.sarif.sarif import decodeSarif
+
+        entries = self.find(rules, uris)
+        if not entries:
+            return
+
+        with open(self.path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for entry in entries:
+                    run_index, result_index, start, end = self.entries[entry]
+                    result = json.loads(buffer[start:end])
+
+                    yield run_index, result_index, decodeSarif(
+                        result, klass=ResultsModel, compact=compact
+                    )
+
+
+def getIndexPath(path: str) -> str:
+    return path + ".idx"
+
+
+def buildIndex(path: str) -> SarifIndex:
+    path = os.path.abspath(path)
+    if path.endswith(".gz"):
+        raise Exception(f"Compressed SARIF files can't be indexed: {path}")
+
+    logger.info(f"Indexing SARIF File: '{path}'")
+    stat = os.stat(path)
+    index = SarifIndex(path, size=stat.st_size, mtime=stat.st_mtime_ns)
+    if not stat.st_size:
+        return index
+
+    with metrics.stage("index", path) as record:
+        with open(path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                results, artifacts = scanSarif(buffer)
+
+        for run_index, result_index, start, end, rule, uri, artifact in results:
+            entry = len(index.entries)
+            index.entries.append([run_index, result_index, start, end])
+
+            if rule:
+                index.rules.setdefault(rule, []).append(entry)
+
+            #  Index only locations are resolved through `run.artifacts`
+            if not uri and artifact is not None:
+                run_artifacts = artifacts.get(run_index, [])
+                if 0 <= artifact < len(run_artifacts):
+                    uri = run_artifacts[artifact]
+            if uri:
+                index.uris.setdefault(uri, []).append(entry)
+
+        if metrics.enabled:
+            record["results"] = len(index.entries)
+
+    return index
+
+
+def loadIndex(path: str, index_path: str = None, save: bool = True) -> SarifIndex:
+    #  Loads the sidecar index of the SARIF file, building it if it's missing
+    #  or the SARIF file has changed since
+    path = os.path.abspath(path)
+    index_path = index_path or getIndexPath(path)
+
+    if os.path.exists(index_path):
+        with open(index_path, "r") as handle:
+            data = json.load(handle)
+
+        if data.get("version") == INDEX_VERSION:
+            index = SarifIndex(
+                path,
+                size=data["size"],
+                mtime=data["mtime"],
+                entries=data["entries"],
+                rules=data["rules"],
+                uris=data["uris"],
+            )
+            if index.isValid():
+                return index
+
+        logger.debug(f"SARIF index is out of date: {index_path}")
+
+    index = buildIndex(path)
+    if save:
+        index.save(index_path)
+    return index
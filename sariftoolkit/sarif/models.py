@@ -2,10 +2,18 @@
 from dataclasses import dataclass, field
 from typing import Any, List, Dict, ClassVar
 
+from sariftoolkit.utils.dataclasses import _slotted_models
 
+
+@dataclass
 class BaseModel:
+    __slots__ = ()
+
     __holders__: ClassVar[Dict[str, str]] = None
 
+    #  JSON members which aren't modelled, written back when exported
+    _extras: Dict[str, Any] = field(default=None, repr=False, compare=False)
+
     def keys(self):
         returns = []
 
@@ -310,3 +318,7 @@ class SarifModel(BaseModel):
             if key == name or name == value:
                 return super().__getattribute__(self.__holders__[key])
         return super().__getattribute__(name)
+
+
+#  Slotted variants of the result models, loaded using `loadSarif(compact=True)`
+COMPACT_MODELS = _slotted_models(ResultsModel)
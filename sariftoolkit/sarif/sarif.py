@@ -1,39 +1,93 @@
+import io
 import os
 import json
+import gzip
 from dataclasses import dataclass, field, asdict
 import logging
 from typing import List, Any
 
-from sariftoolkit.utils.dataclasses import _dataclass_from_dict
+from sariftoolkit.metrics import metrics, countSarif
+from sariftoolkit.utils.dataclasses import DataclassDecoder, dataclassAsDict
 from sariftoolkit.sarif.models import *
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 logger = logging.getLogger("sarif")
 
+_decoder = DataclassDecoder()
+_compact_decoder = DataclassDecoder(models=COMPACT_MODELS)
+
+
+def decodeSarif(data: dict, klass=SarifModel, compact: bool = False):
+    if compact:
+        return _compact_decoder.decode(klass, data)
+    return _decoder.decode(klass, data)
+
 
-def loadSarif(path: str):
+def loadSarif(path: str, compact: bool = False):
     path = os.path.abspath(path)
     logger.info(f"Loading SARIF File: '{path}'")
-    with open(path, "r") as handle:
-        sarif_dict = json.load(handle)
+    with metrics.stage("load", path) as record:
+        with open(path, "r") as handle:
+            sarif_dict = json.load(handle)
+
+        sarif = decodeSarif(sarif_dict, compact=compact)
+
+        if metrics.enabled:
+            record["results"], record["locations"] = countSarif(sarif)
+
+    return sarif
+
+
+def sarifAsDict(sarif: SarifModel) -> dict:
+    return dataclassAsDict(sarif)
+
+
+def encodeSarif(data: dict, indent: int = 4, compact: bool = False) -> bytes:
+    #  Compact output has no whitespace and uses orjson when it's installed
+    if compact:
+        if orjson:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    return json.dumps(data, indent=indent).encode()
+
+
+def dumpSarif(handle, data: dict, compact: bool = False):
+    #  Writes the SARIF to a binary handle, the standard json module encodes
+    #  it in chunks instead of into a single string
+    if compact and orjson:
+        handle.write(orjson.dumps(data))
+        return
+
+    writer = io.TextIOWrapper(handle, encoding="utf-8")
+    if compact:
+        json.dump(data, writer, separators=(",", ":"))
+    else:
+        json.dump(data, writer, indent=4)
+    writer.flush()
+    writer.detach()
 
-    return _dataclass_from_dict(SarifModel, sarif_dict)
 
+def writeSarif(path: str, data: dict, indent: int = 4, compact: bool = False):
+    #  Paths ending in `.gz` are written gzip compressed
+    with metrics.stage("export", path) as record:
+        content = encodeSarif(data, indent=indent, compact=compact)
 
-def exportSarif(path: str, sarif: SarifModel):
-    def _exportAsDict(obj):
-        data = asdict(obj)
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wb") as handle:
+            handle.write(content)
 
-        if hasattr(obj, "__holders__"):
-            for key, value in obj.__holders__.items():
-                if value in data:
-                    data[key] = data[value]
-                    data.pop(value)
+        if metrics.enabled:
+            record["results"], record["locations"] = countSarif(data)
 
-        return data
 
+def exportSarif(path: str, sarif: SarifModel, compact: bool = False):
     path = os.path.abspath(path)
     logger.info(f"Exporting SARIF File: '{path}'")
 
-    with open(path, "w") as handle:
-        json.dump(_exportAsDict(sarif), handle, indent=4)
+    writeSarif(path, sarifAsDict(sarif), indent=4, compact=compact)
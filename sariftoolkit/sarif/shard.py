@@ -0,0 +1,210 @@
+import os
+import zlib
+import logging
+from typing import List
+
+from sariftoolkit.sarif.sarif import encodeSarif, writeSarif
+
+
+logger = logging.getLogger("sarif")
+
+#  GitHub code scanning upload limits
+#  https://docs.github.com/en/code-security/code-scanning/integrating-with-code-scanning/sarif-support-for-code-scanning#validating-your-sarif-file
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_MAX_RESULTS = 25000
+UPLOAD_MAX_RUNS = 20
+
+
+class SarifSharder:
+    #  Packs results into shards while estimating the gzip compressed size of
+    #  each shard incrementally. Every shard has the full run metadata (tool,
+    #  rules, artifacts, ...) so rule and artifact indexes stay valid.
+    def __init__(
+        self,
+        sarif: dict,
+        max_bytes: int = None,
+        max_results: int = None,
+        max_runs: int = None,
+        indent: int = None,
+        compact: bool = True,
+        level: int = 6,
+    ):
+        self.max_bytes = max_bytes
+        self.max_results = max_results
+        self.max_runs = max_runs
+        self.indent = indent
+        self.compact = compact
+        self.level = level
+
+        self.document = {key: value for key, value in sarif.items() if key != "runs"}
+        self.shards = []
+
+        self.runs = None
+        self.run_results = None
+
+    def encode(self, data) -> bytes:
+        return encodeSarif(data, indent=self.indent, compact=self.compact)
+
+    def encodeResult(self, result: dict) -> bytes:
+        encoded = self.encode(result)
+        if self.compact or not self.indent:
+            return encoded
+
+        #  Results are indented 4 levels deep (`runs[].results[]`) in the file
+        prefix = b" " * (self.indent * 4)
+        return prefix + encoded.replace(b"\n", b"\n" + prefix)
+
+    def startShard(self):
+        self.runs = []
+        self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        self.compressed = 0
+        self.pending = 0
+        if self.max_bytes:
+            self.feed(self.encode(self.document))
+
+    def finishShard(self):
+        if self.runs and any(run["results"] for run in self.runs):
+            self.shards.append(dict(self.document, runs=self.runs))
+        self.runs = None
+
+    def startRun(self, run: dict):
+        #  Runs continued in a new shard have the same metadata
+        if self.runs is None:
+            self.startShard()
+        elif self.max_runs and len(self.runs) >= self.max_runs:
+            self.finishShard()
+            self.startShard()
+
+        self.run_results = []
+        self.runs.append(dict(run, results=self.run_results))
+        if self.max_bytes:
+            self.feed(self.encode({k: v for k, v in run.items() if k != "results"}))
+
+    def feed(self, data: bytes):
+        if not self.max_bytes:
+            return
+        self.compressed += len(self.compressor.compress(data))
+        self.pending += len(data)
+
+    def estimate(self, size: int) -> int:
+        #  Compressed size of the shard with `size` more bytes, compressed data
+        #  is only flushed when the upper bound is over the budget
+        if self.compressed + self.pending + size > self.max_bytes and self.pending:
+            self.compressed += len(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+            self.pending = 0
+        return self.compressed + self.pending + size
+
+    def fits(self, encoded: bytes) -> bool:
+        if self.max_results and len(self.run_results) >= self.max_results:
+            return False
+        if self.max_bytes and self.estimate(len(encoded)) > self.max_bytes:
+            return False
+        return True
+
+    def addResult(self, run: dict, result: dict):
+        encoded = self.encodeResult(result) if self.max_bytes else b""
+
+        if self.run_results and not self.fits(encoded):
+            self.finishShard()
+            self.startRun(run)
+
+        elif not self.run_results and self.max_bytes:
+            if self.estimate(len(encoded)) > self.max_bytes:
+                logger.warning("SARIF result is larger than the shard size limit")
+
+        self.run_results.append(result)
+        self.feed(encoded + b",")
+
+    def shard(self, runs: list) -> List[dict]:
+        for run in runs:
+            self.startRun(run)
+            for result in run.get("results") or []:
+                self.addResult(run, result)
+
+        self.finishShard()
+        return self.shards
+
+
+def setShardCategory(sarif: dict, shard: int):
+    #  Shards are separate analyses, without a unique category (the
+    #  `automationDetails.id` up to the last `/`) each upload replaces the last.
+    #  The categories are only stable while the number of shards is the same
+    #  (see the README), results move between shards as the file changes.
+    for index, run in enumerate(sarif["runs"]):
+        details = run.get("automationDetails") or {}
+        category, _, run_id = (details.get("id") or "").rpartition("/")
+        prefix = f"{category}/" if category else ""
+
+        sarif["runs"][index] = dict(
+            run, automationDetails=dict(details, id=f"{prefix}shard-{shard}/{run_id}")
+        )
+
+
+def shardSarif(
+    sarif: dict,
+    max_bytes: int = None,
+    max_results: int = None,
+    max_runs: int = None,
+    indent: int = None,
+    compact: bool = True,
+    level: int = 6,
+) -> List[dict]:
+    #  Splits the SARIF document into valid SARIF documents under the gzip
+    #  compressed byte, results per run and runs budgets. The results and
+    #  metadata are shared with the original document.
+    if not max_bytes and not max_results and not max_runs:
+        return [sarif]
+
+    sharder = SarifSharder(
+        sarif, max_bytes, max_results, max_runs, indent, compact, level
+    )
+    shards = sharder.shard(sarif.get("runs", []))
+
+    if len(shards) <= 1:
+        return [sarif]
+
+    logger.info(
+        f"Split SARIF into {len(shards)} shards "
+        f"(categories 'shard-1' to 'shard-{len(shards)}')"
+    )
+    for index, shard in enumerate(shards):
+        setShardCategory(shard, index + 1)
+    return shards
+
+
+def getShardPath(path: str, shard: int) -> str:
+    #  The first shard keeps the original path (`results.sarif`, then
+    #  `results-2.sarif`, ...)
+    if shard <= 1:
+        return path
+
+    base, compression = path, ""
+    if base.endswith(".gz"):
+        base, compression = base[:-3], ".gz"
+    file_name, file_ext = os.path.splitext(base)
+    return f"{file_name}-{shard}{file_ext}{compression}"
+
+
+def writeSarifShards(
+    path: str,
+    data: dict,
+    indent: int = 4,
+    compact: bool = False,
+    max_bytes: int = None,
+    max_results: int = None,
+) -> List[str]:
+    #  Writes the SARIF file, split into shards when it's over the limits
+    shards = shardSarif(
+        data,
+        max_bytes=max_bytes,
+        max_results=max_results,
+        indent=None if compact else indent,
+        compact=compact,
+    )
+
+    paths = []
+    for index, shard in enumerate(shards):
+        shard_path = getShardPath(path, index + 1)
+        writeSarif(shard_path, shard, indent=indent, compact=compact)
+        paths.append(shard_path)
+    return paths
@@ -0,0 +1,361 @@
+import os
+import re
+import json
+import gzip
+import logging
+from typing import Callable, List
+
+
+logger = logging.getLogger("sarif")
+
+CHUNK_SIZE = 64 * 1024
+
+#  JSON strings, brackets and the start of strings split across reads
+SKIP_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]"]')
+
+
+class JsonStream:
+    def __init__(self, handle, chunk_size: int = CHUNK_SIZE):
+        self.handle = handle
+        self.chunk_size = chunk_size
+
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = None) -> bool:
+        if self.eof:
+            return False
+
+        #  Drop everything that has already been consumed
+        if self.position:
+            self.buffer = self.buffer[self.position :]
+            self.position = 0
+
+        data = self.handle.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+
+        self.buffer += data
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer):
+                char = self.buffer[self.position]
+                if char not in " \t\r\n":
+                    return char
+                self.position += 1
+
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise Exception(
+                f"Invalid SARIF stream, expected '{char}' but found '{found}'"
+            )
+        self.position += 1
+
+    def decode(self):
+        self.peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                #  Value is incomplete, read at least as much again as is pending
+                pending = len(self.buffer) - self.position
+                if not self._fill(max(self.chunk_size, pending)):
+                    raise
+                continue
+
+            #  Numbers at the end of the buffer might be truncated
+            if end == len(self.buffer) and self._fill():
+                continue
+
+            self.position = end
+            return value
+
+    def skip(self):
+        #  Skips the next value, objects and arrays are only scanned for their
+        #  brackets and strings and aren't decoded
+        if self.peek() not in ("{", "["):
+            self.decode()
+            return
+
+        depth = 0
+        position = self.position
+        while True:
+            match = SKIP_TOKENS.search(self.buffer, position)
+            if not match or match.group() == '"':
+                #  Keep the unfinished string, read at least as much again
+                self.position = match.start() if match else len(self.buffer)
+                pending = len(self.buffer) - self.position
+                if not self._fill(max(self.chunk_size, pending)):
+                    raise Exception("Invalid SARIF stream, unexpected end")
+                position = self.position
+                continue
+
+            position = match.end()
+            token = match.group()
+            if token in ("{", "["):
+                depth += 1
+            elif token in ("}", "]"):
+                depth -= 1
+                if not depth:
+                    self.position = position
+                    return
+
+    def members(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+
+        while True:
+            key = self.decode()
+            self.expect(":")
+
+            yield key
+
+            char = self.peek()
+            self.position += 1
+            if char == "}":
+                return
+            elif char != ",":
+                raise Exception(f"Invalid SARIF stream, unexpected '{char}'")
+
+    def items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index += 1
+
+            char = self.peek()
+            self.position += 1
+            if char == "]":
+                return
+            elif char != ",":
+                raise Exception(f"Invalid SARIF stream, unexpected '{char}'")
+
+
+class JsonStreamWriter:
+    def __init__(self, handle):
+        self.handle = handle
+        self.first = [True]
+
+    def _separator(self):
+        if self.first and not self.first[-1]:
+            self.handle.write(",")
+        if self.first:
+            self.first[-1] = False
+
+    def start(self, char: str, key: str = None):
+        if key is not None:
+            self.key(key)
+        else:
+            self._separator()
+        self.handle.write(char)
+        self.first.append(True)
+
+    def end(self, char: str):
+        self.first.pop()
+        self.handle.write(char)
+
+    def key(self, key: str):
+        self._separator()
+        self.handle.write(json.dumps(key) + ":")
+
+    def value(self, value, key: str = None):
+        if key is not None:
+            self.key(key)
+        else:
+            self._separator()
+            self.handle.write("\n")
+        self.handle.write(json.dumps(value))
+
+    def raw(self, value: str):
+        #  Array item which is already JSON encoded
+        self._separator()
+        self.handle.write("\n")
+        self.handle.write(value)
+
+
+def readRunMembers(path: str, keys: List[str]) -> List[dict]:
+    #  Returns the `keys` members of every run, everything else is skipped
+    runs = []
+    with open(path, "r") as handle:
+        reader = JsonStream(handle)
+
+        for key in reader.members():
+            if key != "runs":
+                reader.skip()
+                continue
+
+            for _ in reader.items():
+                run = {}
+                runs.append(run)
+                for run_key in reader.members():
+                    if run_key in keys:
+                        run[run_key] = reader.decode()
+                    else:
+                        reader.skip()
+    return runs
+
+
+def streamSarif(
+    path: str,
+    output: str = None,
+    processors: List[Callable[[dict, dict], dict]] = [],
+    finishers: List[Callable[[dict], list]] = [],
+    starters: List[Callable[[dict, int], None]] = [],
+    lookahead: List[str] = [],
+):
+    #  Processors are called with the run (members read so far) and a result,
+    #  and return the result to write or None to drop it. Only a single result
+    #  is decoded at a time. Starters are called with the run and its index
+    #  before its results, finishers are called at the end of the results of
+    #  each run and return results to add. Returns the SARIF document without
+    #  the results.
+    #
+    #  The `lookahead` run members are in the run before the starters are
+    #  called and are written after them (so starters can update them), even
+    #  when they come after the results in the SARIF file. Those are read
+    #  with an extra pass over the file, only when needed.
+    path = os.path.abspath(path)
+    logger.info(f"Streaming SARIF File: '{path}'")
+
+    sarif = {}
+    run_members = None
+
+    writer = None
+    if output:
+        output = os.path.abspath(output)
+        logger.info(f"Streaming SARIF output to: '{output}'")
+
+        temp_output = output + ".tmp"
+        if output.endswith(".gz"):
+            output_handle = gzip.open(temp_output, "wt")
+        else:
+            output_handle = open(temp_output, "w")
+        writer = JsonStreamWriter(output_handle)
+
+    try:
+        with open(path, "r") as handle:
+            reader = JsonStream(handle)
+
+            if writer:
+                writer.start("{")
+
+            for key in reader.members():
+                if key != "runs":
+                    sarif[key] = reader.decode()
+                    if writer:
+                        writer.value(sarif[key], key=key)
+                    continue
+
+                sarif["runs"] = []
+                if writer:
+                    writer.start("[", key=key)
+
+                for run_index in reader.items():
+                    run = {}
+                    sarif["runs"].append(run)
+                    if writer:
+                        writer.start("{")
+
+                    #  Lookahead members which haven't been written yet
+                    pending = []
+                    started = False
+
+                    for run_key in reader.members():
+                        if run_key != "results":
+                            if run_key not in lookahead:
+                                run[run_key] = reader.decode()
+                            elif started and run_key in run:
+                                #  Read ahead, the starters may have updated it
+                                reader.skip()
+                            else:
+                                run[run_key] = reader.decode()
+                                if not started:
+                                    pending.append(run_key)
+                                    continue
+
+                            if writer:
+                                writer.value(run[run_key], key=run_key)
+                            continue
+
+                        missing = [key for key in lookahead if key not in run]
+                        if missing and run_members is None:
+                            run_members = readRunMembers(path, lookahead)
+                        for key in missing:
+                            if key in run_members[run_index]:
+                                run[key] = run_members[run_index][key]
+
+                        for starter in starters:
+                            starter(run, run_index)
+                        started = True
+
+                        for key in pending:
+                            if writer:
+                                writer.value(run[key], key=key)
+                        pending = []
+
+                        if writer:
+                            writer.start("[", key=run_key)
+
+                        for _ in reader.items():
+                            result = reader.decode()
+
+                            for processor in processors:
+                                result = processor(run, result)
+                                if result is None:
+                                    break
+
+                            if writer and result is not None:
+                                writer.value(result)
+
+                        for finisher in finishers:
+                            for result in finisher(run):
+                                if writer:
+                                    writer.value(result)
+
+                        if writer:
+                            writer.end("]")
+
+                    #  Runs without results
+                    for key in pending:
+                        if writer:
+                            writer.value(run[key], key=key)
+
+                    if writer:
+                        writer.end("}")
+
+                if writer:
+                    writer.end("]")
+
+            if writer:
+                writer.end("}")
+                writer.handle.write("\n")
+
+    except Exception:
+        if writer:
+            output_handle.close()
+            os.remove(temp_output)
+        raise
+
+    if writer:
+        output_handle.close()
+        os.replace(temp_output, output)
+
+    return sarif
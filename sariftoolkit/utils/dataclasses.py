@@ -1,4 +1,13 @@
+import typing
 import logging
+import dataclasses
+from typing import List
+
+
+#  Field of the models holding the JSON members which aren't modelled
+EXTRAS = "_extras"
+
+_exports = {}
 
 
 def _dataclass_from_dict(klass, dikt):
@@ -24,3 +33,150 @@ def _dataclass_from_dict(klass, dikt):
         if isinstance(dikt, (tuple, list)):
             return [_dataclass_from_dict(klass.__args__[0], f) for f in dikt]
         return dikt
+
+
+def _slotted(klass):
+    #  Copy of the dataclass using __slots__ instead of a per-instance __dict__
+    names = tuple(field.name for field in dataclasses.fields(klass))
+
+    namespace = dict(klass.__dict__)
+    for name in names + ("__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = names
+
+    return type(klass.__name__, klass.__bases__, namespace)
+
+
+def _slotted_models(klass, models: dict = None) -> dict:
+    #  Slotted copies of the model and every model nested inside of it
+    models = {} if models is None else models
+    if klass in models:
+        return models
+
+    models[klass] = _slotted(klass)
+
+    for field in dataclasses.fields(klass):
+        for fieldtype in [field.type, *typing.get_args(field.type)]:
+            if dataclasses.is_dataclass(fieldtype):
+                _slotted_models(fieldtype, models)
+
+    return models
+
+
+class DataclassDecoder:
+    def __init__(self, models: dict = None):
+        #  Optional replacement classes to create (e.g. slotted models)
+        self.models = models or {}
+        self._decoders = {}
+
+    def decode(self, klass, dikt):
+        return self.compile(klass)(dikt)
+
+    def compile(self, klass):
+        decoder = self._decoders.get(klass)
+        if decoder:
+            return decoder
+
+        target = self.models.get(klass, klass)
+        fields = dataclasses.fields(klass)
+        extras = any(field.name == EXTRAS for field in fields)
+
+        #  Json key -> (attribute name, converter)
+        table = {}
+        table_get = table.get
+
+        def decoder(dikt):
+            if not isinstance(dikt, dict):
+                return dikt
+
+            data = {}
+            unknown = None
+            for key, value in dikt.items():
+                entry = table_get(key)
+                if entry is None:
+                    #  Members which aren't modelled are kept as they are
+                    if extras:
+                        if unknown is None:
+                            unknown = {}
+                        unknown[key] = value
+                    continue
+
+                name, converter = entry
+                if converter is not None and value is not None:
+                    value = converter(value)
+                data[name] = value
+
+            if unknown:
+                data[EXTRAS] = unknown
+            return target(**data)
+
+        #  Register before compiling fields so recursive models resolve
+        self._decoders[klass] = decoder
+
+        fieldtypes = {}
+        for field in fields:
+            if field.name == EXTRAS:
+                continue
+            fieldtypes[field.name] = field.type
+            table[field.name] = (field.name, self._converter(field.type))
+
+        for key, holder in (getattr(klass, "__holders__", None) or {}).items():
+            table[key] = (holder, self._converter(fieldtypes.get(holder)))
+
+        return decoder
+
+    def _converter(self, fieldtype):
+        if dataclasses.is_dataclass(fieldtype):
+            return self.compile(fieldtype)
+
+        if typing.get_origin(fieldtype) in (list, List):
+            args = typing.get_args(fieldtype)
+            inner = self._converter(args[0]) if args else None
+            if inner is None:
+                return None
+
+            def converter(value):
+                if isinstance(value, list):
+                    return [inner(v) for v in value]
+                return value
+
+            return converter
+
+        return None
+
+
+def _exportTable(klass) -> list:
+    #  (attribute name, JSON key) of each field of the model
+    table = _exports.get(klass)
+    if table is None:
+        holders = {
+            name: key
+            for key, name in (getattr(klass, "__holders__", None) or {}).items()
+        }
+        table = _exports[klass] = [
+            (field.name, holders.get(field.name, field.name))
+            for field in dataclasses.fields(klass)
+            if field.name != EXTRAS
+        ]
+    return table
+
+
+def dataclassAsDict(value):
+    #  Same as `dataclasses.asdict` but every model uses the JSON keys of its
+    #  holders and has the members which weren't modelled written back. The
+    #  members are shared with the model, not copied.
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        data = {
+            key: dataclassAsDict(getattr(value, name))
+            for name, key in _exportTable(type(value))
+        }
+        extras = getattr(value, EXTRAS, None)
+        if extras:
+            data.update(extras)
+        return data
+
+    if isinstance(value, (list, tuple)):
+        return [dataclassAsDict(item) for item in value]
+    if isinstance(value, dict):
+        return {key: dataclassAsDict(item) for key, item in value.items()}
+    return value
@@ -0,0 +1,95 @@
+import os
+import unittest
+
+from tests.utils import ToolkitTestCase, createResult, createRichSarif, createSarif
+
+
+class BaselineTestCase(ToolkitTestCase):
+    def setUp(self):
+        super().setUp()
+        baseline = createRichSarif()
+        results = baseline["runs"][1]["results"]
+        baseline["runs"][1]["results"] = results[:10] + [
+            createResult("fixed", "src/fixed.py")
+        ]
+        self.baseline = self.writeSarif("main.sarif", baseline)
+
+    def runBaseline(self, *args) -> list:
+        folders = self.runModes(
+            createRichSarif(), "--baseline-sarif", self.baseline, *args
+        )
+
+        outputs = [
+            self.readSarif(os.path.join(folder, "results.sarif"))
+            for folder in folders.values()
+        ]
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+        return outputs[0]["runs"][1]["results"]
+
+    def test_baseline_modes(self):
+        results = self.runBaseline("--enable-baseline")
+
+        self.assertEqual(
+            [result["ruleId"] for result in results],
+            [f"rule-{index % 3}" for index in range(10, 20)]
+            + ["no-locations", "empty-locations"],
+        )
+        self.assertTrue(all(result["baselineState"] == "new" for result in results))
+
+    def test_baseline_fixed(self):
+        results = self.runBaseline("--enable-baseline", "--baseline-fixed")
+
+        self.assertEqual(len(results), 13)
+        self.assertEqual(results[-1]["ruleId"], "fixed")
+        self.assertEqual(results[-1]["baselineState"], "absent")
+
+    def test_baseline_categories(self):
+        #  Runs of the same tool are compared with the run of their category
+        def createRuns(python: list, javascript: list, categories: bool) -> dict:
+            runs = []
+            for category, results in (("py/", python), ("js/", javascript)):
+                run = {"tool": {"driver": {"name": "CodeQL"}}, "results": results}
+                if categories:
+                    run["automationDetails"] = {"id": category}
+                runs.append(run)
+            return {"version": "2.1.0", "runs": runs}
+
+        for categories in (True, False):
+            baseline = self.writeSarif(
+                "categories.sarif",
+                createRuns(
+                    [createResult("py/a", "a.py"), createResult("py/c", "c.py")],
+                    [createResult("js/b", "b.js")],
+                    categories,
+                ),
+            )
+            folders = self.runModes(
+                createRuns(
+                    [createResult("py/a", "a.py")],
+                    [createResult("js/b", "b.js"), createResult("js/d", "d.js")],
+                    categories,
+                ),
+                "--enable-baseline",
+                "--baseline-sarif",
+                baseline,
+                "--baseline-fixed",
+            )
+
+            for mode, folder in folders.items():
+                runs = self.readSarif(os.path.join(folder, "results.sarif"))["runs"]
+                self.assertEqual(
+                    [
+                        [
+                            (result["ruleId"], result["baselineState"])
+                            for result in run["results"]
+                        ]
+                        for run in runs
+                    ],
+                    [[("py/c", "absent")], [("js/d", "new")]],
+                    (mode, categories),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
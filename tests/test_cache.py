@@ -0,0 +1,111 @@
+import os
+import unittest
+
+from tests.utils import ToolkitTestCase, createRichSarif, startUploadServer
+
+
+SKIPPED = "Skipping already processed SARIF file"
+
+
+class CacheTestCase(ToolkitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = os.path.join(self.temp, "cache")
+        self.sarif = self.writeSarif("results.sarif", createRichSarif())
+
+    def runCached(self, *args, **env):
+        return self.runToolkit(
+            "--cache", self.cache, "--sarif", self.sarif, *args, **env
+        )
+
+    def runSubmodules(self, *args, **env):
+        return self.runCached(
+            "--enable-submodules",
+            "--github-workspace",
+            self.workspace,
+            *args,
+            **env,
+        )
+
+    def test_cache_modes(self):
+        #  Every mode skips the files it processed, with the same output
+        arguments = [
+            "--enable-relativepaths",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            "--output",
+        ]
+        outputs = []
+        for mode in ("", "--stream", "--pipeline"):
+            output = os.path.join(self.temp, (mode.strip("-") or "default") + ".sarif")
+            args = ([mode] if mode else []) + arguments + [output]
+
+            self.assertNotIn(SKIPPED, self.runCached(*args).stderr)
+            self.assertIn(SKIPPED, self.runCached(*args, "--profile").stderr)
+            outputs.append(self.readSarif(output))
+
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+    def test_cache_shards(self):
+        #  Every shard of the output is checked, and the shard and mode
+        #  settings are part of the cache key
+        output = os.path.join(self.temp, "output.sarif")
+        args = [
+            "--enable-relativepaths",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            "--output",
+            output,
+            "--shard-results",
+            "5",
+        ]
+        self.assertNotIn(SKIPPED, self.runCached(*args).stderr)
+        self.assertIn(SKIPPED, self.runCached(*args).stderr)
+
+        os.remove(os.path.join(self.temp, "output-3.sarif"))
+        self.assertNotIn(SKIPPED, self.runCached(*args).stderr)
+        self.assertTrue(os.path.exists(os.path.join(self.temp, "output-3.sarif")))
+
+        self.assertNotIn(SKIPPED, self.runCached(*args[:-1], "10").stderr)
+        self.assertNotIn(SKIPPED, self.runCached("--pipeline", *args).stderr)
+        self.assertIn(SKIPPED, self.runCached("--pipeline", *args).stderr)
+
+    def test_cache_without_token(self):
+        #  Nothing was uploaded, so the file is processed again
+        for mode in ("", "--submodules-async"):
+            args = [mode] if mode else []
+            self.runSubmodules(*args)
+
+            self.assertNotIn(SKIPPED, self.runSubmodules(*args).stderr, mode)
+
+    def test_cache_uploads(self):
+        server = startUploadServer(self)
+        instance = "http://127.0.0.1:%d" % server.server_address[1]
+
+        #  A failed upload isn't recorded, the next (successful) upload is
+        for mode in ("", "--stream", "--pipeline", "--submodules-async"):
+            server.statuses = [404]
+            args = [mode] if mode else []
+
+            self.runSubmodules(*args, "--github-instance", instance, GITHUB_TOKEN="t")
+            process = self.runSubmodules(
+                *args, "--github-instance", instance, GITHUB_TOKEN="t"
+            )
+            self.assertNotIn(SKIPPED, process.stderr, mode)
+
+            process = self.runSubmodules(
+                *args, "--github-instance", instance, GITHUB_TOKEN="t"
+            )
+            self.assertIn(SKIPPED, process.stderr, mode)
+
+            for name in os.listdir(self.cache):
+                os.remove(os.path.join(self.cache, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
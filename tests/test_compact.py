@@ -0,0 +1,46 @@
+import os
+import gzip
+import json
+import unittest
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class CompactTestCase(ToolkitTestCase):
+    def runRelativePaths(self, *args):
+        path = self.writeSarif("results.sarif", createRichSarif())
+        self.runToolkit(
+            "--enable-relativepaths",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            "--sarif",
+            path,
+            *args,
+        )
+
+    def test_compact_output(self):
+        outputs = {}
+        for name, args in (
+            ("default.sarif", []),
+            ("compact.sarif", ["--compact"]),
+            ("compact.sarif.gz", ["--compact"]),
+            ("pipeline.sarif.gz", ["--compact", "--pipeline"]),
+            ("stream.sarif.gz", ["--stream"]),
+        ):
+            output = os.path.join(self.temp, name)
+            self.runRelativePaths("--output", output, *args)
+
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(output, "rb") as handle:
+                outputs[name] = handle.read()
+
+        self.assertNotIn(b"\n ", outputs["compact.sarif"])
+        expected = json.loads(outputs.pop("default.sarif"))
+        for name, output in outputs.items():
+            self.assertEqual(json.loads(output), expected, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
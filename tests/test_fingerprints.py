@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from sariftoolkit.plugins.fingerprints import computeLineHashes, hashSourceFile
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class FingerprintsTestCase(ToolkitTestCase):
+    def test_line_hashes_chunks(self):
+        #  Hashes don't depend on how the text is split into chunks
+        text = "def main():\r\n\treturn 1  # \U0001f600\n\n  print('done')\n"
+        hashes = computeLineHashes([text])
+
+        #  The end of the file is hashed as a last (empty) line
+        self.assertEqual(len(hashes), 5)
+        for size in (1, 2, 7):
+            chunks = [text[start : start + size] for start in range(0, len(text), size)]
+            self.assertEqual(computeLineHashes(chunks), hashes)
+
+        self.assertEqual(computeLineHashes([text], {2}), {2: hashes[2]})
+
+    def test_source_file(self):
+        path = os.path.join(self.temp, "source.py")
+        with open(path, "wb") as handle:
+            #  Invalid UTF-8 is replaced, the same as the CodeQL Action
+            handle.write("print('café')\n".encode("utf-8") + b"\xff\n")
+
+        hashes = hashSourceFile((path, None))
+        self.assertEqual(sorted(hashes), [1, 2, 3])
+        self.assertEqual(hashSourceFile((path, [2])), {2: hashes[2]})
+
+    def test_fingerprints_modes(self):
+        folders = self.runModes(
+            createRichSarif(),
+            "--enable-fingerprints",
+            "--github-workspace",
+            self.workspace,
+        )
+
+        outputs = [
+            self.readSarif(os.path.join(folder, "results.sarif"))
+            for folder in folders.values()
+        ]
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+        #  Only the submodule source file exists in the workspace (4 lines)
+        fingerprinted = []
+        for result in outputs[0]["runs"][1]["results"]:
+            if "primaryLocationLineHash" in result.get("partialFingerprints", {}):
+                physical = result["locations"][0]["physicalLocation"]
+                uri = physical["artifactLocation"]["uri"]
+                fingerprinted.append((uri, physical["region"]["startLine"]))
+        self.assertEqual(fingerprinted, [("crypto/app.py", 2), ("crypto/app.py", 4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import json
+import unittest
+
+from sariftoolkit.sarif.index import buildIndex, getIndexPath, loadIndex
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class IndexTestCase(ToolkitTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sarif = createRichSarif()
+        #  Indented, the same as the output of the toolkit
+        self.path = os.path.join(self.temp, "results.sarif")
+        with open(self.path, "w") as handle:
+            json.dump(self.sarif, handle, indent=2)
+
+    def test_index_results(self):
+        #  Every result is read back as it is in the SARIF file
+        index = buildIndex(self.path)
+        results = self.sarif["runs"][1]["results"]
+
+        self.assertEqual(len(index.entries), len(results))
+        self.assertEqual(list(index.readResults(range(len(index.entries)))), results)
+
+    def test_index_query(self):
+        index = buildIndex(self.path)
+
+        found = [
+            (run_index, result_index)
+            for run_index, result_index, _ in index.query(
+                rules=["rule-1"], uris=["crypto/app.py"]
+            )
+        ]
+        expected = [
+            (1, result_index)
+            for result_index, result in enumerate(self.sarif["runs"][1]["results"])
+            if result["ruleId"] == "rule-1"
+            and result.get("locations")
+            and result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"]
+            == "crypto/app.py"
+        ]
+        self.assertEqual(found, expected)
+        self.assertTrue(found)
+
+    def test_index_cache(self):
+        index = loadIndex(self.path)
+        self.assertTrue(os.path.exists(getIndexPath(self.path)))
+        self.assertEqual(loadIndex(self.path).entries, index.entries)
+
+        #  Changing the SARIF file rebuilds the index
+        with open(self.path, "w") as handle:
+            json.dump(createRichSarif(4), handle)
+        self.assertEqual(len(loadIndex(self.path).entries), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from tests.utils import ToolkitTestCase, createResult, createRichSarif, createSarif
+
+
+class MergeTestCase(ToolkitTestCase):
+    def getResults(self, sarif: dict, tool: str = "Tool") -> list:
+        for run in sarif["runs"]:
+            if run["tool"]["driver"]["name"] == tool:
+                return run["results"]
+        return []
+
+    def test_merge_files(self):
+        #  Results reported by more than one SARIF file are only kept once
+        rich = createRichSarif()
+        self.writeSarif(os.path.join("sarifs", "a.sarif"), rich)
+        self.writeSarif(
+            os.path.join("sarifs", "b.sarif"),
+            createSarif(
+                rich["runs"][1]["results"][:5] + [createResult("rule-b", "b.py")]
+            ),
+        )
+        output = os.path.join(self.temp, "merged.sarif")
+
+        self.runToolkit(
+            "--enable-merge",
+            "--sarif",
+            os.path.join(self.temp, "sarifs"),
+            "--merge-output",
+            output,
+        )
+
+        results = self.getResults(self.readSarif(output))
+        self.assertEqual(len(results), 23)
+        self.assertEqual(results[:22], rich["runs"][1]["results"])
+        self.assertEqual(results[22]["ruleId"], "rule-b")
+
+    def test_merge_modes(self):
+        #  Streaming and the pipeline run the merge on its own, into the same
+        #  merged SARIF file
+        sarif = createRichSarif()
+        sarif["runs"][1]["results"] += sarif["runs"][1]["results"][:10]
+
+        folders = self.runModes(sarif, "--enable-merge")
+
+        expected = self.readSarif(os.path.join(folders[""], "merged.sarif"))
+        self.assertEqual(len(self.getResults(expected)), 22)
+        for mode in ("--stream", "--pipeline"):
+            output = self.readSarif(os.path.join(folders[mode], "merged.sarif"))
+            self.assertEqual(output, expected, mode)
+
+    def test_merge_files_modes(self):
+        #  SARIF files are merged into `--merge-output` in every mode
+        rich = createRichSarif()
+        self.writeSarif(os.path.join("sarifs", "a.sarif"), rich)
+        self.writeSarif(
+            os.path.join("sarifs", "b.sarif"),
+            createSarif([createResult("rule-b", "b.py")]),
+        )
+
+        outputs = []
+        for mode in ("", "--stream", "--pipeline"):
+            output = os.path.join(self.temp, (mode.strip("-") or "default") + ".sarif")
+            process = self.runToolkit(
+                *([mode] if mode else []),
+                "--enable-merge",
+                "--sarif",
+                os.path.join(self.temp, "sarifs"),
+                "--merge-output",
+                output,
+            )
+            if mode:
+                self.assertIn("Merge needs every SARIF file", process.stderr)
+            outputs.append(self.readSarif(output))
+
+        self.assertEqual(len(self.getResults(outputs[0])), 23)
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import subprocess
+import unittest
+
+from sariftoolkit.metrics import Metrics, peakRss
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class MetricsTestCase(ToolkitTestCase):
+    def test_peak_rss(self):
+        #  In bytes on every platform
+        self.assertGreater(peakRss(), 1024 * 1024)
+        self.assertLess(peakRss(), 1024**4)
+
+    def test_child_cpu(self):
+        metrics = Metrics()
+        metrics.enabled = True
+
+        with metrics.stage("child"):
+            subprocess.run([sys.executable, "-c", "sum(range(20000000))"], check=True)
+
+        record = metrics.records[0]
+        self.assertGreater(record["cpu"], 0.1)
+        self.assertGreaterEqual(record["wall"], 0.1)
+
+    def test_metrics_json(self):
+        for name in ("a.sarif", "b.sarif"):
+            self.writeSarif(os.path.join("sarifs", name), createRichSarif())
+        path = os.path.join(self.temp, "metrics.json")
+
+        self.runToolkit(
+            "--enable-relativepaths",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            "--sarif",
+            os.path.join(self.temp, "sarifs"),
+            "--jobs",
+            "2",
+            "--metrics-json",
+            path,
+        )
+
+        metrics = self.readSarif(path)
+        loads = [record for record in metrics["stages"] if record["stage"] == "load"]
+        #  Stages run by the workers are sent back to the main process
+        self.assertEqual(len(loads), 2)
+        self.assertEqual(metrics["summary"]["load"]["results"], 44)
+
+
+if __name__ == "__main__":
+    unittest.main()
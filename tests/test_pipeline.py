@@ -0,0 +1,95 @@
+import os
+import shutil
+import unittest
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class PipelineTestCase(ToolkitTestCase):
+    def readOutputs(self, folders: dict) -> list:
+        return [
+            self.readSarif(os.path.join(folder, "results.sarif"))
+            for folder in folders.values()
+        ]
+
+    def test_pipeline_plugins(self):
+        #  Plugins run one after another on the same SARIF file
+        folders = self.runModes(
+            createRichSarif(),
+            "--enable-relativepaths",
+            "--enable-fingerprints",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+        )
+
+        outputs = self.readOutputs(folders)
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+        results = outputs[0]["runs"][1]["results"]
+        self.assertEqual(len(results), 22)
+        self.assertEqual(
+            results[0]["locations"][0]["physicalLocation"]["artifactLocation"]["uri"],
+            "sub/src/main.py",
+        )
+
+    def test_jobs(self):
+        #  The output is the same regardless of the number of jobs
+        for index in range(4):
+            self.writeSarif(os.path.join("sarifs", f"{index}.sarif"), createRichSarif())
+
+        outputs = {}
+        for jobs in ("1", "2", "0"):
+            for mode in ("", "--pipeline"):
+                folder = os.path.join(self.temp, f"{mode.strip('-')}{jobs}")
+                shutil.copytree(os.path.join(self.temp, "sarifs"), folder)
+                self.runToolkit(
+                    *([mode] if mode else []),
+                    "--enable-relativepaths",
+                    "--enable-fingerprints",
+                    "--github-workspace",
+                    self.workspace,
+                    "--working",
+                    os.path.join(self.workspace, "sub"),
+                    "--sarif",
+                    folder,
+                    "--jobs",
+                    jobs,
+                )
+                outputs[(mode, jobs)] = [
+                    self.readSarif(os.path.join(folder, f"{index}.sarif"))
+                    for index in range(4)
+                ]
+
+        expected = outputs.pop(("", "1"))
+        for key, output in outputs.items():
+            self.assertEqual(output, expected, key)
+
+    def test_chunks(self):
+        #  Chunks of a run processed by the jobs have the same output
+        folders = self.runModes(
+            createRichSarif(40),
+            "--enable-fingerprints",
+            "--enable-submodules",
+            "--submodules-disable-cleanup",
+            "--github-workspace",
+            self.workspace,
+            "--jobs",
+            "2",
+            "--chunk-results",
+            "6",
+            modes=("", "--pipeline"),
+        )
+
+        for name in ("results.sarif", "results-crypto.sarif"):
+            outputs = [
+                self.readSarif(os.path.join(folder, name))
+                for folder in folders.values()
+            ]
+            self.assertEqual(outputs[1], outputs[0], name)
+
+
+if __name__ == "__main__":
+    unittest.main()
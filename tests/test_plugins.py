@@ -0,0 +1,36 @@
+import unittest
+
+from sariftoolkit.plugin import loadPlugins, pluginConfigs
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class PluginsTestCase(ToolkitTestCase):
+    def test_list(self):
+        output = self.runToolkit("--list").stdout
+
+        for config in pluginConfigs():
+            self.assertIn(f" >> {config.name} - {config.description}", output)
+
+    def test_metadata(self):
+        #  Plugins take their description from their config
+        for plugin in loadPlugins():
+            self.assertEqual(plugin.description, plugin.config.description)
+
+    def test_enabled_logging(self):
+        sarif = self.writeSarif("results.sarif", createRichSarif())
+        process = self.runToolkit(
+            "--enable-relativepaths",
+            "--sarif",
+            sarif,
+            "--github-workspace",
+            self.workspace,
+        )
+
+        self.assertIn("Plugin :: RelativePaths - enabled", process.stderr)
+        self.assertIn("Plugin :: Submodules - disabled", process.stderr)
+        self.assertNotIn("PluginConfig(", process.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import unittest
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+def createArtifactSarif(after: bool = False) -> dict:
+    #  Locations reference their artifact in `run.artifacts` by index, the
+    #  code flow locations only by index
+    sarif = createRichSarif()
+    run = sarif["runs"][-1]
+    uris = ["src/main.py", "crypto/app.py"]
+
+    for result in run["results"]:
+        for location in result.get("locations", []):
+            artifact = location["physicalLocation"]["artifactLocation"]
+            artifact["index"] = uris.index(artifact["uri"])
+
+        for flow in result.get("codeFlows", []):
+            for step in flow["threadFlows"][0]["locations"]:
+                artifact = step["location"]["physicalLocation"]["artifactLocation"]
+                artifact["index"] = uris.index(artifact.pop("uri"))
+
+    artifacts = [{"location": {"uri": uri}} for uri in uris]
+    sarif["runs"][-1] = {"tool": run["tool"]}
+    if not after:
+        sarif["runs"][-1]["artifacts"] = artifacts
+    sarif["runs"][-1]["results"] = run["results"]
+    if after:
+        sarif["runs"][-1]["artifacts"] = artifacts
+    return sarif
+
+
+class ArtifactTableTestCase(ToolkitTestCase):
+    def runArtifactModes(self, *args, modes, after: bool = False):
+        folders = self.runModes(
+            createArtifactSarif(after),
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            *args,
+            modes=modes,
+        )
+        return {
+            mode: self.readSarif(os.path.join(folder, "results.sarif"))
+            for mode, folder in folders.items()
+        }
+
+    def test_artifact_table_modes(self):
+        #  Every mode rewrites the table, wherever it is in the run
+        modes = (
+            "--artifact-table",
+            "--pipeline --artifact-table",
+            "--stream --artifact-table",
+        )
+        for after in (False, True):
+            outputs = self.runArtifactModes(
+                "--enable-relativepaths", modes=modes, after=after
+            )
+
+            expected = outputs[modes[0]]
+            run = expected["runs"][-1]
+            self.assertEqual(
+                [artifact["location"]["uri"] for artifact in run["artifacts"]],
+                ["sub/src/main.py", "sub/crypto/app.py"],
+            )
+            self.assertEqual(
+                run["results"][0]["locations"][0]["physicalLocation"][
+                    "artifactLocation"
+                ],
+                {"uri": "sub/src/main.py", "index": 0},
+            )
+            for mode in modes[1:]:
+                self.assertEqual(outputs[mode], expected, (mode, after))
+
+    def test_artifact_table_default(self):
+        #  Locations resolved through the table are the same as rewritten ones
+        outputs = self.runArtifactModes(
+            "--enable-relativepaths", modes=("", "--artifact-table")
+        )
+
+        locations = [
+            [result.get("locations") for result in output["runs"][-1]["results"]]
+            for output in outputs.values()
+        ]
+        self.assertEqual(locations[1], locations[0])
+
+    def test_artifact_table_submodules(self):
+        #  Submodules classify the artifacts after Relative Paths rewrote them,
+        #  the same as when each plugin processes the whole file
+        modes = ("--artifact-table", "--pipeline --artifact-table")
+        folders = self.runModes(
+            createArtifactSarif(),
+            "--enable-relativepaths",
+            "--enable-submodules",
+            "--submodules-disable-cleanup",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+            modes=modes,
+        )
+
+        files = [sorted(os.listdir(folder)) for folder in folders.values()]
+        self.assertEqual(files[1], files[0])
+
+        outputs = [
+            self.readSarif(os.path.join(folder, "results.sarif"))
+            for folder in folders.values()
+        ]
+        self.assertEqual(outputs[1], outputs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
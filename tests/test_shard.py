@@ -0,0 +1,70 @@
+import os
+import gzip
+import json
+import unittest
+
+from sariftoolkit.sarif.shard import shardSarif
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class ShardTestCase(ToolkitTestCase):
+    def test_shard_results(self):
+        sarif = createRichSarif()
+        shards = shardSarif(sarif, max_results=5)
+
+        self.assertEqual(len(shards), 5)
+        results = []
+        for index, shard in enumerate(shards):
+            for run in shard["runs"]:
+                self.assertLessEqual(len(run["results"]), 5)
+                self.assertEqual(run["automationDetails"]["id"], f"shard-{index + 1}/")
+                results.extend(run["results"])
+        self.assertEqual(results, sarif["runs"][1]["results"])
+
+    def test_shard_bytes(self):
+        sarif = createRichSarif(200)
+        shards = shardSarif(sarif, max_bytes=1024)
+
+        self.assertGreater(len(shards), 1)
+        for shard in shards:
+            encoded = json.dumps(shard, separators=(",", ":")).encode()
+            self.assertLessEqual(len(gzip.compress(encoded)), 1024)
+
+    def test_shard_category(self):
+        #  The category of the run is kept before the shard
+        sarif = createRichSarif()
+        sarif["runs"][1]["automationDetails"] = {"id": "python/main/1"}
+
+        for index, shard in enumerate(shardSarif(sarif, max_results=11)):
+            self.assertEqual(
+                shard["runs"][-1]["automationDetails"]["id"],
+                f"python/main/shard-{index + 1}/1",
+            )
+
+    def test_shard_modes(self):
+        #  The default and pipeline output is sharded the same
+        folders = self.runModes(
+            createRichSarif(),
+            "--enable-fingerprints",
+            "--github-workspace",
+            self.workspace,
+            "--shard-results",
+            "8",
+            modes=("", "--pipeline"),
+        )
+
+        outputs = []
+        for folder in folders.values():
+            names = sorted(os.listdir(folder))
+            self.assertEqual(
+                names, ["results-2.sarif", "results-3.sarif", "results.sarif"]
+            )
+            outputs.append(
+                [self.readSarif(os.path.join(folder, name)) for name in names]
+            )
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
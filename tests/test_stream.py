@@ -0,0 +1,112 @@
+import os
+import unittest
+
+from sariftoolkit.sarif.stream import JsonStream, readRunMembers, streamSarif
+
+from tests.utils import ToolkitTestCase, createRichSarif
+
+
+class StreamTestCase(ToolkitTestCase):
+    def test_stream_roundtrip(self):
+        sarif = createRichSarif()
+        path = self.writeSarif("input.sarif", sarif)
+        output = os.path.join(self.temp, "output.sarif")
+
+        document = streamSarif(path, output)
+
+        self.assertEqual(self.readSarif(output), sarif)
+        self.assertEqual(len(document["runs"]), 2)
+        self.assertNotIn("results", document["runs"][1])
+
+    def test_stream_processors(self):
+        path = self.writeSarif("input.sarif", createRichSarif())
+        output = os.path.join(self.temp, "output.sarif")
+
+        def drop(run: dict, result: dict):
+            return None if result.get("locations") else result
+
+        streamSarif(path, output, processors=[drop])
+
+        results = self.readSarif(output)["runs"][1]["results"]
+        self.assertEqual(
+            [result["ruleId"] for result in results],
+            ["no-locations", "empty-locations"],
+        )
+
+    def test_stream_skip(self):
+        #  Strings with brackets and quotes are skipped across reads
+        text = '{"a": [{"b": "x]}\\"{["}, [1, 2]], "c": "}", "d": {"e": []}}'
+        path = os.path.join(self.temp, "skip.json")
+        with open(path, "w") as handle:
+            handle.write(text)
+
+        with open(path) as handle:
+            reader = JsonStream(handle, chunk_size=3)
+            values = {}
+            for key in reader.members():
+                if key in ("a", "d"):
+                    reader.skip()
+                else:
+                    values[key] = reader.decode()
+        self.assertEqual(values, {"c": "}"})
+
+    def test_stream_lookahead(self):
+        #  Lookahead members are read before the results and written after the
+        #  starters, wherever they are in the run
+        sarif = createRichSarif()
+        run = sarif["runs"][1]
+        run["automationDetails"] = {"id": "category/"}
+        path = self.writeSarif("input.sarif", sarif)
+        output = os.path.join(self.temp, "output.sarif")
+
+        self.assertEqual(
+            readRunMembers(path, ["automationDetails"]),
+            [{}, {"automationDetails": {"id": "category/"}}],
+        )
+
+        started = []
+
+        def start(run: dict, run_index: int):
+            started.append((run_index, run.get("automationDetails", {}).get("id")))
+            if "automationDetails" in run:
+                run["automationDetails"]["id"] = "updated/"
+
+        streamSarif(
+            path, output, starters=[start], lookahead=["automationDetails", "tool"]
+        )
+
+        self.assertEqual(started, [(0, None), (1, "category/")])
+        written = self.readSarif(output)
+        self.assertEqual(written["runs"][1]["automationDetails"], {"id": "updated/"})
+        self.assertEqual(written["runs"][1]["results"], run["results"])
+        self.assertEqual(written["runs"][1]["tool"], run["tool"])
+
+    def test_relativepaths_modes(self):
+        #  Every mode has the same output, results without locations are kept
+        folders = self.runModes(
+            createRichSarif(),
+            "--enable-relativepaths",
+            "--github-workspace",
+            self.workspace,
+            "--working",
+            os.path.join(self.workspace, "sub"),
+        )
+
+        outputs = [
+            self.readSarif(os.path.join(folder, "results.sarif"))
+            for folder in folders.values()
+        ]
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+        results = outputs[0]["runs"][1]["results"]
+        self.assertEqual(len(results), 22)
+        self.assertEqual(
+            results[0]["locations"][0]["physicalLocation"]["artifactLocation"]["uri"],
+            "sub/src/main.py",
+        )
+        self.assertEqual(results[0]["level"], "warning")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,325 @@
+import os
+import json
+import gzip
+import base64
+import unittest
+from unittest import mock
+
+import requests
+
+from sariftoolkit.plugins.submodules import (
+    ResultSpill,
+    SubmoduleIndex,
+    SubmoduleModel,
+    Submodules,
+)
+from sariftoolkit.sarif.sarif import decodeSarif, sarifAsDict
+
+from tests.utils import (
+    ToolkitTestCase,
+    createResult,
+    createRichSarif,
+    createSarif,
+    createWorkspace,
+    git,
+    startUploadServer,
+)
+
+
+class SubmodulesTestCase(ToolkitTestCase):
+    def splitSarif(self, sarif: dict, *args, modes=("", "--stream", "--pipeline")):
+        #  Returns the `crypto` submodule SARIF file of each mode
+        folders = self.runModes(
+            sarif,
+            "--enable-submodules",
+            "--submodules-disable-cleanup",
+            "--github-workspace",
+            self.workspace,
+            *args,
+            modes=modes,
+        )
+        return {
+            mode: self.readSarif(os.path.join(folder, "results-crypto.sarif"))
+            for mode, folder in folders.items()
+        }
+
+    def test_decoder_keeps_members(self):
+        sarif = createRichSarif()
+        sarif["runs"][1]["tool"]["driver"]["rules"] = [
+            {"id": "rule-0", "properties": {"security-severity": "9.0", "cwe": 1}}
+        ]
+
+        for compact in (False, True):
+            data = sarifAsDict(decodeSarif(sarif, compact=compact))
+
+            self.assertEqual(data["$schema"], sarif["$schema"])
+            rule = data["runs"][1]["tool"]["driver"]["rules"][0]
+            self.assertEqual(rule["properties"]["security-severity"], "9.0")
+            self.assertEqual(rule["properties"]["cwe"], 1)
+
+            for result, original in zip(
+                data["runs"][1]["results"], sarif["runs"][1]["results"]
+            ):
+                for key in ("level", "properties", "relatedLocations", "codeFlows"):
+                    self.assertEqual(result.get(key), original.get(key))
+
+    def test_split_keeps_members(self):
+        #  Members which aren't modelled are kept in the submodule SARIF file
+        for mode, output in self.splitSarif(
+            createRichSarif(), modes=("", "--compact-models")
+        ).items():
+            results = output["runs"][-1]["results"]
+            self.assertEqual(len(results), 10, mode)
+            for result in results:
+                self.assertEqual(result["level"], "warning")
+                self.assertEqual(result["properties"]["tags"], ["security"])
+                self.assertIn("custom", result["properties"])
+                self.assertEqual(len(result["relatedLocations"]), 1)
+                self.assertEqual(len(result["codeFlows"]), 1)
+                self.assertEqual(
+                    result["locations"][0]["physicalLocation"]["artifactLocation"][
+                        "uri"
+                    ],
+                    "app.py",
+                )
+
+    def test_split_modes(self):
+        #  Every mode has the same submodule SARIF file
+        outputs = list(self.splitSarif(createRichSarif()).values())
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+    def test_split_compact_models(self):
+        #  Slotted models write the same submodule SARIF file
+        for mode in ("", "--stream"):
+            modes = (mode, f"{mode} --compact-models".strip())
+            outputs = self.splitSarif(createRichSarif(), modes=modes)
+            self.assertEqual(outputs[modes[1]], outputs[modes[0]], mode)
+
+    def test_split_async(self):
+        #  Splitting while uploading has the same submodule SARIF file
+        outputs = self.splitSarif(createRichSarif(), modes=("", "--submodules-async"))
+        self.assertEqual(outputs["--submodules-async"], outputs[""])
+
+    def test_result_spill(self):
+        spill = ResultSpill()
+        spill.append(0, "rule-a", b'{"a":1}')
+        spill.append(1, "rule-b", b'{"b":1}')
+        spill.append(0, "rule-c", b'{"c":1}')
+
+        self.assertEqual(spill.spill(), 21)
+        spill.append(0, "rule-a", b'{"a":2}')
+
+        self.assertEqual(spill.count(0), 3)
+        self.assertEqual(list(spill.read(0)), [b'{"a":1}', b'{"a":2}', b'{"c":1}'])
+        self.assertEqual(list(spill.read(1)), [b'{"b":1}'])
+        spill.close()
+
+    def test_split_memory_budget(self):
+        #  Results spilled to disk over the memory budget (1 MB) are written
+        #  the same as the results kept in memory
+        sarif = createRichSarif(5000)
+        expected = self.splitSarif(sarif, modes=("",))[""]
+
+        for mode in ("", "--stream", "--pipeline"):
+            path = self.writeSarif(os.path.join("budget", "results.sarif"), sarif)
+            process = self.runToolkit(
+                *([mode] if mode else []),
+                "--enable-submodules",
+                "--submodules-disable-cleanup",
+                "--github-workspace",
+                self.workspace,
+                "--sarif",
+                path,
+                "--memory-budget",
+                "1",
+            )
+            self.assertIn("spilling submodule results to disk", process.stderr)
+
+            output = self.readSarif(path.replace(".sarif", "-crypto.sarif"))
+            self.assertEqual(output, expected, mode)
+
+    def test_split_run_index(self):
+        #  Results are filed under their own run, after a run without results
+        sarif = createSarif(
+            [createResult("rule-b", "crypto/app.py")],
+            tool="ToolB",
+            runs=[{"tool": {"driver": {"name": "ToolA"}}}],
+        )
+
+        for mode, output in self.splitSarif(sarif).items():
+            runs = output["runs"]
+            self.assertEqual(
+                [run["tool"]["driver"]["name"] for run in runs],
+                ["ToolA", "ToolB"],
+                mode,
+            )
+            self.assertEqual(runs[0]["results"], [], mode)
+            self.assertEqual(
+                [result["ruleId"] for result in runs[1]["results"]], ["rule-b"], mode
+            )
+
+    def test_parse_git_head(self):
+        plugin = Submodules()
+
+        self.assertEqual(
+            plugin.parseGitHead("/path/with spaces/.git\n0123abcd\n"),
+            ("0123abcd", "/path/with spaces/.git"),
+        )
+        self.assertEqual(plugin.parseGitHead(""), (None, None))
+
+    def test_discovery_cache(self):
+        #  The cache is invalidated when a submodule checkout changes
+        workspace = createWorkspace(self.temp)
+        plugin = Submodules()
+
+        branch = plugin.getSubmodules(workspace)[0].branch
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(workspace, ".git", "sariftoolkit-submodules.json")
+            )
+        )
+        self.assertEqual(plugin.getSubmodules(workspace)[0].branch, branch)
+
+        submodule = os.path.join(workspace, "crypto")
+        git("checkout", "-q", "-b", "feature", cwd=submodule)
+        git("remote", "set-url", "origin", "git@github.com:org/fork.git", cwd=submodule)
+
+        submodules = plugin.getSubmodules(workspace)
+        self.assertEqual(submodules[0].branch, "refs/heads/feature")
+        self.assertEqual(submodules[0].url, "org/fork")
+
+
+class SubmoduleIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.submodules = {
+            path: SubmoduleModel(name=path.split("/")[-1], path=path)
+            for path in ("a", "a/b", "lib", "vendor/c")
+        }
+        self.index = SubmoduleIndex(list(self.submodules.values()))
+
+    def lookup(self, file: str):
+        submodule, path = self.index.lookup(file)
+        return (submodule.path if submodule else None, path)
+
+    def test_lookup(self):
+        self.assertEqual(self.lookup("lib/src/main.py"), ("lib", "src/main.py"))
+        self.assertEqual(self.lookup("vendor/c/app.py"), ("vendor/c", "app.py"))
+        self.assertEqual(self.lookup("vendor/app.py"), (None, None))
+        self.assertEqual(self.lookup("src/lib/main.py"), (None, None))
+
+    def test_lookup_nested(self):
+        #  The deepest submodule containing the file is used
+        self.assertEqual(self.lookup("a/main.py"), ("a", "main.py"))
+        self.assertEqual(self.lookup("a/b/main.py"), ("a/b", "main.py"))
+        self.assertEqual(self.lookup("a/b/c/main.py"), ("a/b", "c/main.py"))
+        self.assertEqual(self.lookup("a/bc/main.py"), ("a", "bc/main.py"))
+
+    def test_lookup_sibling_prefix(self):
+        #  Paths only match whole components
+        self.assertEqual(self.lookup("library/x.py"), (None, None))
+        self.assertEqual(self.lookup("lib.py"), (None, None))
+        self.assertEqual(self.lookup("vendor/cc/app.py"), (None, None))
+
+    def test_lookup_submodule_root(self):
+        #  The submodule folder itself isn't a file in the submodule
+        self.assertEqual(self.lookup("lib"), (None, None))
+        self.assertEqual(self.lookup("vendor/c"), (None, None))
+
+
+class UploadsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = startUploadServer(self)
+        self.instance = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.plugin = Submodules(token="secret", instance=self.instance, backoff=0)
+        self.submodule = SubmoduleModel(
+            name="crypto", url="org/lib", branch="refs/heads/main", commit="0123abcd"
+        )
+        self.sarif = decodeSarif(
+            createSarif([createResult("rule-0", "app.py")], tool="ToolA")
+        )
+
+    def publish(self):
+        futures = self.plugin.publishSarifFile(self.submodule, self.sarif)
+        self.plugin.waitForUploads()
+        return futures[0].result()
+
+    def test_upload_endpoint(self):
+        self.assertEqual(self.publish().status_code, 202)
+
+        path, headers, body = self.server.requests[0]
+        self.assertEqual(path, "/api/v3/repos/org/lib/code-scanning/sarifs")
+        self.assertEqual(headers["Authorization"], "token secret")
+        self.assertEqual(body["commit_sha"], "0123abcd")
+        self.assertEqual(body["ref"], "refs/heads/main")
+        self.assertEqual(body["tool_name"], "ToolA")
+
+        sarif = json.loads(gzip.decompress(base64.b64decode(body["sarif"])))
+        self.assertEqual(sarif["runs"][0]["results"][0]["ruleId"], "rule-0")
+
+    def test_api_url(self):
+        self.assertEqual(
+            Submodules().getApiUrl("https://github.com"), "https://api.github.com"
+        )
+        self.assertEqual(
+            Submodules().getApiUrl("https://ghes.example.com/"),
+            "https://ghes.example.com/api/v3",
+        )
+
+        plugin = Submodules(
+            instance="https://ghes.example.com", api_url="https://api.example.com/"
+        )
+        self.assertEqual(plugin.getApiUrl(), "https://api.example.com")
+
+    def test_upload_retry(self):
+        self.server.statuses = [502, 429]
+
+        self.assertEqual(self.publish().status_code, 202)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_upload_failure(self):
+        #  Client errors aren't retried
+        self.server.statuses = [404]
+
+        with self.assertLogs("Plugin-Submodules", "ERROR"):
+            self.assertEqual(self.publish().status_code, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_upload_timeout(self):
+        session = self.plugin.getSession()
+        responses = [requests.Timeout("timeout")]
+
+        def post(*args, **kargvs):
+            if responses:
+                raise responses.pop()
+            return requests.Session.post(session, *args, **kargvs)
+
+        with mock.patch.object(session, "post", side_effect=post) as patched:
+            self.assertEqual(self.publish().status_code, 202)
+
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_upload_errors(self):
+        #  An upload failing after its retries doesn't stop the other uploads
+        self.plugin.retries = 0
+        session = self.plugin.getSession()
+        responses = [requests.ConnectionError("refused")]
+
+        def post(*args, **kargvs):
+            if responses:
+                raise responses.pop()
+            return requests.Session.post(session, *args, **kargvs)
+
+        with mock.patch.object(session, "post", side_effect=post):
+            with self.assertLogs("Plugin-Submodules", "ERROR"):
+                self.plugin.publishSarifFile(self.submodule, self.sarif)
+                self.plugin.publishSarifFile(self.submodule, self.sarif)
+                self.assertFalse(self.plugin.waitForUploads())
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertIsNone(self.plugin.uploader)
+
+
+if __name__ == "__main__":
+    unittest.main()
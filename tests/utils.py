@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import subprocess
+import http.server
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git(*args, cwd: str):
+    subprocess.run(
+        [
+            "git",
+            "-c",
+            "protocol.file.allow=always",
+            "-c",
+            "user.name=sarif-toolkit",
+            "-c",
+            "user.email=sarif-toolkit@localhost",
+            *args,
+        ],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def createWorkspace(root: str) -> str:
+    #  Repository with a `crypto` submodule (remote `org/lib`) and a `sub`
+    #  folder used as the working directory
+    lib = os.path.join(root, "lib")
+    os.makedirs(lib)
+    git("init", "-q", "-b", "main", cwd=lib)
+    with open(os.path.join(lib, "app.py"), "w") as handle:
+        handle.write("import os\n\nprint(os.environ)\n")
+    git("add", ".", cwd=lib)
+    git("commit", "-q", "-m", "lib", cwd=lib)
+
+    workspace = os.path.join(root, "ws")
+    os.makedirs(os.path.join(workspace, "sub"))
+    git("init", "-q", "-b", "main", cwd=workspace)
+    git("submodule", "add", "-q", "../lib", "crypto", cwd=workspace)
+    git(
+        "remote",
+        "set-url",
+        "origin",
+        "git@github.com:org/lib.git",
+        cwd=os.path.join(workspace, "crypto"),
+    )
+    git("commit", "-q", "-m", "workspace", cwd=workspace)
+    return workspace
+
+
+def createResult(rule: str, uri: str = None, line: int = 1, **members) -> dict:
+    result = {"ruleId": rule, "message": {"text": f"{rule} message"}}
+    if uri:
+        result["locations"] = [
+            {
+                "physicalLocation": {
+                    "artifactLocation": {"uri": uri},
+                    "region": {"startLine": line},
+                }
+            }
+        ]
+    result.update(members)
+    return result
+
+
+def createSarif(results: list, tool: str = "Tool", runs: list = None) -> dict:
+    return {
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": (runs or [])
+        + [{"tool": {"driver": {"name": tool, "rules": []}}, "results": results}],
+    }
+
+
+def createRichSarif(count: int = 20) -> dict:
+    #  Results in and outside of the submodule, with members which aren't
+    #  modelled, without locations and an empty run first
+    results = []
+    for index in range(count):
+        uri = "crypto/app.py" if index % 2 else "src/main.py"
+        results.append(
+            createResult(
+                f"rule-{index % 3}",
+                uri,
+                line=index + 1,
+                level="warning",
+                properties={"tags": ["security"], "custom": index},
+                relatedLocations=[
+                    {
+                        "id": 1,
+                        "physicalLocation": {"artifactLocation": {"uri": uri}},
+                        "message": {"text": "related"},
+                    }
+                ],
+                codeFlows=[
+                    {
+                        "threadFlows": [
+                            {
+                                "locations": [
+                                    {
+                                        "location": {
+                                            "physicalLocation": {
+                                                "artifactLocation": {"uri": uri}
+                                            }
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ],
+            )
+        )
+    results.append(createResult("no-locations"))
+    results.append(createResult("empty-locations", locations=[]))
+
+    empty = {"tool": {"driver": {"name": "Empty"}}, "results": []}
+    return createSarif(results, runs=[empty])
+
+
+class UploadHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, self.headers, body))
+
+        status = self.server.statuses.pop(0) if self.server.statuses else 202
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def startUploadServer(testcase: unittest.TestCase):
+    #  Local code scanning API, responds with `server.statuses` (then 202) and
+    #  records `server.requests`
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), UploadHandler)
+    server.requests, server.statuses = [], []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    testcase.addCleanup(server.server_close)
+    testcase.addCleanup(server.shutdown)
+    return server
+
+
+class ToolkitTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = tempfile.mkdtemp(prefix="sarif-toolkit-")
+        cls.workspace = createWorkspace(cls.fixtures)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.fixtures, ignore_errors=True)
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp(prefix="sarif-test-")
+        self.addCleanup(shutil.rmtree, self.temp, True)
+
+    def writeSarif(self, name: str, data: dict) -> str:
+        path = os.path.join(self.temp, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as handle:
+            json.dump(data, handle)
+        return path
+
+    def readSarif(self, path: str) -> dict:
+        with open(path, "r") as handle:
+            return json.load(handle)
+
+    def runToolkit(self, *args, **env) -> subprocess.CompletedProcess:
+        #  Runs the toolkit as a module from the repository root
+        environment = dict(os.environ, PYTHONPATH=ROOT)
+        for name in ("GITHUB_TOKEN", "GITHUB_SERVER_URL", "GITHUB_API_URL"):
+            environment.pop(name, None)
+        environment.pop("GITHUB_WORKSPACE", None)
+        environment.update(env)
+
+        process = subprocess.run(
+            [sys.executable, "-m", "sariftoolkit", *args],
+            cwd=ROOT,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            self.fail(f"sariftoolkit failed:\n{process.stderr}")
+        return process
+
+    def runModes(self, sarif: dict, *args, modes=("", "--stream", "--pipeline")):
+        #  Runs the toolkit on a copy of the SARIF file in each mode (one or
+        #  more arguments), returns the folder of each mode
+        folders = {}
+        for mode in modes:
+            name = "-".join(argument.strip("-") for argument in mode.split())
+            folder = os.path.join(self.temp, name or "default")
+            path = self.writeSarif(os.path.join(folder, "results.sarif"), sarif)
+            self.runToolkit(*mode.split(), "--sarif", path, *args)
+            folders[mode] = folder
+        return folders